@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+
+from .changelog import ChangeLogFollower
+from .db import SessionLocal
+from . import store
+
+try:
+    import brotli
+except ImportError:  # in requirements.txt; without it only gzip is offered
+    brotli = None
+
+# Bodies below this size are sent uncompressed; the framing overhead of
+# gzip/br outweighs the savings for a single small article.
+COMPRESS_MIN_SIZE = 1024
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for token in accept_encoding.split(","):
+        coding, _, params = token.partition(";")
+        name, _, value = params.partition("=")
+        if name.strip() == "q":
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Compressed bodies, filled lazily per content coding
+    _encoded: Dict[str, bytes] = field(default_factory=dict, repr=False)
+
+    def _compressed(self, coding: str) -> bytes:
+        data = self._encoded.get(coding)
+        if data is None:
+            if coding == "br":
+                data = brotli.compress(self.body, quality=5)
+            else:
+                data = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self._encoded[coding] = data
+        return data
+
+    def to_response(self, request: Request) -> Response:
+        coding = None
+        if len(self.body) >= COMPRESS_MIN_SIZE:
+            coding = negotiate_encoding(request.headers.get("accept-encoding"))
+
+        # Each content coding is its own representation and gets its own
+        # strong validator
+        etag = self.etag if coding is None else f'{self.etag[:-1]}-{coding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            **self.headers,
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if coding is None:
+            return Response(content=self.body, media_type="application/json", headers=headers)
+        headers["Content-Encoding"] = coding
+        return Response(
+            content=self._compressed(coding), media_type="application/json", headers=headers
+        )
+
+
+def encode(payload: Any, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+    # Same encoding as FastAPI's JSONResponse, so cached and uncached bodies match
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return CachedResponse(body=body, etag=etag, headers=headers or {})
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match uses the weak comparison function
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResponseCache:
+    """Encoded feed pages and article details, versioned by change-log revision.
+
+    ``version`` is the last change-log revision applied to the cache. Each
+    batch of changes moves it forward: feed pages are dropped wholesale (an
+    insert shifts every page), detail entries only for the changed ids.
+    Callers capture ``version`` before reading the store and pass it back to
+    ``put_*`` so a response computed from data that changed mid-request is
+    never cached. The cache is per process; each worker follows the change
+    log itself through a ``ResponseCacheUpdater``.
+    """
+
+    def __init__(self, max_pages: int = 256, max_details: int = 10_000):
+        self.version = 0
+        self.pages = LRUCache(max_pages)
+        self.details = LRUCache(max_details)
+
+    def get_page(self, key: Hashable) -> Optional[CachedResponse]:
+        return self.pages.get((self.version, key))
+
+    def put_page(self, version: int, key: Hashable, entry: CachedResponse) -> CachedResponse:
+        if version == self.version:
+            self.pages.put((version, key), entry)
+        return entry
+
+    def get_detail(self, article_id: str) -> Optional[CachedResponse]:
+        return self.details.get(article_id)
+
+    def put_detail(self, version: int, article_id: str, entry: CachedResponse) -> CachedResponse:
+        if version == self.version:
+            self.details.put(article_id, entry)
+        return entry
+
+    def invalidate(self, article_ids: Iterable[str], revision: int) -> None:
+        self.version = revision
+        self.pages.clear()
+        for article_id in article_ids:
+            self.details.pop(article_id)
+
+    def reset(self, revision: int) -> None:
+        self.version = revision
+        self.pages.clear()
+        self.details.clear()
+
+
+class ResponseCacheUpdater(ChangeLogFollower):
+    """Drops cached responses for every change in the log, whichever process wrote it."""
+
+    def __init__(self, cache: ResponseCache, poll_interval: float = 5.0, batch_size: int = 2000):
+        super().__init__(poll_interval)
+        self.cache = cache
+        self.batch_size = batch_size
+
+    async def start(self) -> None:
+        async with SessionLocal() as session:
+            self.cache.reset(await store.current_revision(session))
+        await super().start()
+
+    async def _catch_up(self) -> None:
+        async with SessionLocal() as session:
+            has_more = True
+            while has_more:
+                article_ids, cursor, has_more = await store.list_changed_ids(
+                    session, self.cache.version, self.batch_size
+                )
+                if cursor == self.cache.version:
+                    break
+                self.cache.invalidate(article_ids, cursor)
+
+
+response_cache = ResponseCache()
+response_cache_updater = ResponseCacheUpdater(response_cache)
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeLogFollower:
+    """Base for background tasks that track the article change log.
+
+    Subclasses implement ``_catch_up`` to process the entries after their
+    own cursor. Register ``notify`` with ``store.on_change`` so writes in this
+    process wake the task immediately; ``poll_interval`` picks up writes from
+    other processes such as ``app.ingest``.
+    """
+
+    def __init__(self, poll_interval: float = 5.0):
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self, article_ids: Iterable[str] = ()) -> None:
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _prepare(self) -> None:
+        """Runs once in the background task before following the log."""
+
+    async def _catch_up(self) -> None:
+        raise NotImplementedError
+
+    async def _run(self) -> None:
+        try:
+            await self._prepare()
+        except Exception:
+            logger.exception("%s failed to prepare", type(self).__name__)
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self._catch_up()
+            except Exception:
+                logger.exception("%s failed to catch up with the change log", type(self).__name__)
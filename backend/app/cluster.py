@@ -0,0 +1,191 @@
+import itertools
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Hash the word bigrams of ``text`` (unigrams for one-word texts)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) > 1:
+        shingles = {f"{a} {b}" for a, b in zip(words, words[1:])}
+    else:
+        shingles = set(words) or {""}
+    return np.fromiter(
+        (zlib.crc32(s.encode()) % MERSENNE_PRIME for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+@dataclass
+class _Doc:
+    signature: np.ndarray
+    band_keys: List[bytes]
+    cluster_id: str
+    source: str
+    url: str
+    published_at: datetime
+
+
+class ClusterIndex:
+    """Groups articles about the same story with MinHash signatures and LSH.
+
+    Signatures are computed for a whole batch at once with NumPy. Each
+    signature is split into ``bands`` buckets; a new article is only compared
+    against articles sharing at least one bucket, and joins the cluster of
+    its most similar candidate if the estimated Jaccard similarity of their
+    shingle sets reaches ``threshold``. Articles older than ``window`` are
+    dropped by ``prune`` so memory stays bounded by the recent intake.
+
+    Cluster ids are opaque and never reused, so an article that leaves a
+    story and starts a new one cannot land back in the old story by id.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 96,
+        bands: int = 32,
+        threshold: float = 0.4,
+        window: timedelta = timedelta(hours=48),
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window = window
+        self._tables: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._docs: Dict[str, _Doc] = {}
+        self._clusters: Dict[str, Set[str]] = {}
+        self._cluster_ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """Return a (len(texts), num_perm) array of MinHash signatures."""
+        hashes = [shingle_hashes(text) for text in texts]
+        offsets = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+        # One (num_perm, total shingles) matrix for the batch, then a
+        # segmented min per document; a and x are below 2**31, so a * x + b
+        # cannot overflow uint64.
+        values = (self._a * np.concatenate(hashes)[None, :] + self._b) % MERSENNE_PRIME
+        return np.minimum.reduceat(values, offsets, axis=1).T.astype(np.uint32)
+
+    def add_batch(self, articles: List[dict]) -> Set[str]:
+        """Index article dicts (store column names) and return touched cluster ids.
+
+        Touched clusters are those the articles joined plus any they left,
+        limited to the ones that still have members after the whole batch.
+        """
+        if not articles:
+            return set()
+        texts = [f"{a['headline']} {a.get('summary', '')}" for a in articles]
+        touched = set()
+        for article, signature in zip(articles, self.signatures(texts)):
+            previous = self._docs.get(article["id"])
+            touched.add(self._add(article, signature))
+            if previous is not None and previous.cluster_id in self._clusters:
+                touched.add(previous.cluster_id)
+        # A later article in the batch may have emptied an earlier one's cluster
+        return {cluster_id for cluster_id in touched if cluster_id in self._clusters}
+
+    def _add(self, article: dict, signature: np.ndarray) -> str:
+        article_id = article["id"]
+        self._remove(article_id)
+
+        band_keys = [
+            signature[i:i + self.rows].tobytes() for i in range(0, len(signature), self.rows)
+        ]
+        candidates = set()
+        for table, key in zip(self._tables, band_keys):
+            candidates.update(table.get(key, ()))
+
+        cluster_id = None
+        if candidates:
+            ids = list(candidates)
+            matrix = np.stack([self._docs[c].signature for c in ids])
+            similarity = (matrix == signature).mean(axis=1)
+            best = int(similarity.argmax())
+            if similarity[best] >= self.threshold:
+                cluster_id = self._docs[ids[best]].cluster_id
+        if cluster_id is None:
+            cluster_id = f"story-{next(self._cluster_ids)}"
+
+        for table, key in zip(self._tables, band_keys):
+            table.setdefault(key, set()).add(article_id)
+        self._docs[article_id] = _Doc(
+            signature=signature,
+            band_keys=band_keys,
+            cluster_id=cluster_id,
+            source=article["source"],
+            url=_own_url(article),
+            published_at=article["published_at"],
+        )
+        self._clusters.setdefault(cluster_id, set()).add(article_id)
+        return cluster_id
+
+    def _remove(self, article_id: str) -> None:
+        doc = self._docs.pop(article_id, None)
+        if doc is None:
+            return
+        for table, key in zip(self._tables, doc.band_keys):
+            bucket = table[key]
+            bucket.discard(article_id)
+            if not bucket:
+                del table[key]
+        members = self._clusters[doc.cluster_id]
+        members.discard(article_id)
+        if not members:
+            del self._clusters[doc.cluster_id]
+
+    def prune(self, now: Optional[datetime] = None) -> None:
+        cutoff = (now or datetime.now()) - self.window
+        for article_id in [i for i, doc in self._docs.items() if doc.published_at < cutoff]:
+            self._remove(article_id)
+
+    def has_cluster(self, cluster_id: str) -> bool:
+        return cluster_id in self._clusters
+
+    def cluster_of(self, article_id: str) -> str:
+        return self._docs[article_id].cluster_id
+
+    def members(self, cluster_id: str) -> List[str]:
+        """Cluster members, canonical (earliest published) article first."""
+        return sorted(
+            self._clusters.get(cluster_id, ()),
+            key=lambda i: (self._docs[i].published_at, i),
+        )
+
+    def canonical(self, cluster_id: str) -> str:
+        return self.members(cluster_id)[0]
+
+    def related_sources(self, cluster_id: str) -> List[dict]:
+        related = []
+        seen = set()
+        for article_id in self.members(cluster_id):
+            doc = self._docs[article_id]
+            if doc.url not in seen:
+                seen.add(doc.url)
+                related.append({"source": doc.source, "url": doc.url})
+        return related
+
+
+def _own_url(article: dict) -> str:
+    # Ingested articles list their own link under their own source name
+    related = article.get("related_sources") or []
+    for entry in related:
+        if entry["source"] == article["source"]:
+            return entry["url"]
+    return related[0]["url"] if related else ""
@@ -0,0 +1,54 @@
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+load_dotenv()
+
+# SQLite is the default local backend; point DATABASE_URL at e.g.
+# postgresql+asyncpg://... in production.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./papergum.db")
+
+
+
+def _engine_options(url: str) -> dict:
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    }
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        # Server connections can be dropped while idle in the pool
+        options["pool_pre_ping"] = True
+    elif parsed.database not in (None, "", ":memory:"):
+        # SQLAlchemy gives file-backed aiosqlite a NullPool, which opens a
+        # new connection and worker thread for every session
+        options["poolclass"] = AsyncAdaptedQueuePool
+    else:
+        # An in-memory database lives and dies with its single connection
+        return {}
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+async def get_session():
+    async with SessionLocal() as session:
+        yield session
+
+
+async def init_db():
+    # Import the models so their tables are registered on Base.metadata
+    from . import models  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
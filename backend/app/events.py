@@ -0,0 +1,122 @@
+import asyncio
+import json
+from typing import Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .changelog import ChangeLogFollower
+from .db import SessionLocal
+from . import store
+
+# Log entries read per delta response / SSE event
+CHANGES_BATCH_SIZE = 500
+
+
+async def load_changes(session: AsyncSession, since: int, limit: int = CHANGES_BATCH_SIZE) -> dict:
+    upserted, removed, cursor, has_more = await store.list_changes(session, since, limit)
+    return {
+        "cursor": cursor,
+        "hasMore": has_more,
+        "upserted": [article.to_dict() for article in upserted],
+        "removed": removed,
+    }
+
+
+def format_event(payload: dict) -> bytes:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {payload['cursor']}\nevent: changes\ndata: {data}\n\n".encode("utf-8")
+
+
+class Subscription:
+    # Sent when a subscriber falls too far behind; the client should resync
+    # from its last cursor via /api/news/changes.
+    OVERFLOW = b"event: reset\ndata: {}\n\n"
+
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def push(self, message: bytes) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.closed = True
+            # Make room so the reset notice always gets through
+            self.queue.get_nowait()
+            self.queue.put_nowait(self.OVERFLOW)
+            return False
+
+
+class Broadcaster(ChangeLogFollower):
+    """Fans out change-log deltas to every connected SSE client.
+
+    A single background task reads each new batch of changes once and pushes
+    the encoded event into every subscriber's queue, so the cost per change
+    does not grow with the number of idle connections. ``heartbeat_interval``
+    keeps proxies from closing idle streams.
+    """
+
+    HEARTBEAT = b": ping\n\n"
+
+    def __init__(
+        self,
+        poll_interval: float = 5.0,
+        heartbeat_interval: float = 15.0,
+        queue_size: int = 64,
+    ):
+        super().__init__(poll_interval)
+        self.heartbeat_interval = heartbeat_interval
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscription] = set()
+        self._cursor = 0
+        self._last_heartbeat = 0.0
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    async def start(self) -> None:
+        async with SessionLocal() as session:
+            self._cursor = await store.current_revision(session)
+        self._last_heartbeat = asyncio.get_running_loop().time()
+        await super().start()
+
+    def _publish(self, message: bytes) -> None:
+        for subscription in list(self.subscribers):
+            if not subscription.push(message):
+                self.subscribers.discard(subscription)
+
+    async def _catch_up(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if now - self._last_heartbeat >= self.heartbeat_interval:
+            self._publish(self.HEARTBEAT)
+            self._last_heartbeat = now
+
+        async with SessionLocal() as session:
+            if not self.subscribers:
+                # Nobody to tell; just skip ahead so the next subscriber is
+                # not sent a backlog it already loads itself. Re-check after
+                # the await in case someone subscribed meanwhile.
+                revision = await store.current_revision(session)
+                if not self.subscribers:
+                    self._cursor = revision
+                return
+
+            has_more = True
+            while has_more:
+                payload = await load_changes(session, self._cursor)
+                has_more = payload["hasMore"]
+                if payload["cursor"] == self._cursor:
+                    break
+                self._cursor = payload["cursor"]
+                self._publish(format_event(payload))
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Twice the rendered size of the card grid tile (h-48) and the detail hero
+# (h-96, max-w-4xl), for high-density screens.
+THUMBNAIL_SIZES = {
+    "card": (800, 384),
+    "detail": (1792, 768),
+}
+MAX_ORIGINAL_BYTES = 20 * 1024 * 1024
+MAX_REDIRECTS = 5
+# Failed URLs are not retried for this long, so a dead image link does not
+# cost an upstream request per page view
+FAILURE_TTL = 300.0
+MAX_FAILURES = 10_000
+# Evicted files stay on disk this long, so a path handed out just before
+# its eviction can still be served
+EVICTION_GRACE = 60.0
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+async def resolve_public_address(url: httpx.URL) -> str:
+    """Resolve the host of ``url`` and return an address that is safe to fetch.
+
+    Image URLs come from third-party feeds, so the proxy must not be usable
+    to reach loopback, private, link-local or otherwise non-public hosts.
+    Every address the name resolves to is checked, and the caller connects
+    to the returned one so a second lookup cannot answer differently.
+    """
+    if url.scheme not in ("http", "https") or not url.host:
+        raise ImageFetchError(f"Unsupported image URL: {url}")
+    port = url.port or (443 if url.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as exc:
+        raise ImageFetchError(f"Cannot resolve {url.host}") from exc
+
+    addresses = []
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ImageFetchError(f"Refusing to fetch from non-public address: {url.host}")
+        addresses.append(str(address))
+    if not addresses:
+        raise ImageFetchError(f"Cannot resolve {url.host}")
+    return addresses[0]
+
+
+def render_thumbnails(original: bytes) -> Dict[str, bytes]:
+    """Crop-to-fill every thumbnail size and encode as WebP."""
+    with Image.open(io.BytesIO(original)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        thumbnails = {}
+        for name, size in THUMBNAIL_SIZES.items():
+            buffer = io.BytesIO()
+            ImageOps.fit(image, size, Image.LANCZOS).save(buffer, "WEBP", quality=80, method=4)
+            thumbnails[name] = buffer.getvalue()
+    return thumbnails
+
+
+class ThumbnailCache:
+    """Content-addressed on-disk thumbnail cache with size-bounded LRU eviction.
+
+    Thumbnails are stored under the SHA-256 of the original image, so the
+    same picture behind several URLs is kept once. A small ``refs`` file per
+    source URL records which digest it resolved to, so originals are
+    downloaded once and not again after a restart. Concurrent requests for a
+    URL that is still being fetched wait on the same task, and failures are
+    remembered for ``FAILURE_TTL`` seconds. Disk I/O runs in worker threads.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # Redirects are followed by hand so every hop is checked
+        self.client = client or httpx.AsyncClient(timeout=15.0)
+        self._files: "OrderedDict[Path, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._evicted: "OrderedDict[Path, float]" = OrderedDict()
+        self._refs: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._failures: "OrderedDict[str, float]" = OrderedDict()
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+
+    def _load(self) -> None:
+        # Rebuild the LRU from disk, oldest modification time first
+        (self.root / "refs").mkdir(parents=True, exist_ok=True)
+        paths = sorted(self.root.glob("??/*.webp"), key=lambda p: p.stat().st_mtime)
+        for path in paths:
+            size = path.stat().st_size
+            self._files[path] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _ref_path(self, url: str) -> Path:
+        return self.root / "refs" / hashlib.sha256(url.encode()).hexdigest()
+
+    def _read_ref(self, url: str) -> Optional[str]:
+        try:
+            return self._ref_path(url).read_text()
+        except FileNotFoundError:
+            return None
+
+    async def _digest_for(self, url: str) -> Optional[str]:
+        digest = self._refs.get(url)
+        if digest is None:
+            digest = await asyncio.to_thread(self._read_ref, url)
+            if digest is not None:
+                self._refs[url] = digest
+        return digest
+
+    def _thumbnail_path(self, digest: str, size: str) -> Path:
+        return self.root / digest[:2] / f"{digest}-{size}.webp"
+
+    async def get(self, url: str, size: str) -> Path:
+        """Return the path of the thumbnail for ``url``, fetching it if needed.
+
+        The file stays on disk for at least ``EVICTION_GRACE`` seconds.
+        """
+        async with self._load_lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load)
+
+        digest = await self._digest_for(url)
+        if digest is not None:
+            path = self._thumbnail_path(digest, size)
+            if path in self._files:
+                self._files.move_to_end(path)
+                return path
+
+        failed_until = self._failures.get(url)
+        if failed_until is not None:
+            if failed_until > time.monotonic():
+                raise ImageFetchError(f"Fetching {url} failed recently")
+            del self._failures[url]
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._fetch(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda done: self._fetched(url, done))
+        digest = await asyncio.shield(task)
+        return self._thumbnail_path(digest, size)
+
+    def _fetched(self, url: str, task: asyncio.Task) -> None:
+        self._inflight.pop(url, None)
+        if not task.cancelled() and isinstance(task.exception(), ImageFetchError):
+            self._failures[url] = time.monotonic() + FAILURE_TTL
+            while len(self._failures) > MAX_FAILURES:
+                self._failures.popitem(last=False)
+
+    async def _open(self, url: httpx.URL) -> httpx.Response:
+        """Send the request, following redirects and vetting every hop."""
+        for _ in range(MAX_REDIRECTS + 1):
+            address = await resolve_public_address(url)
+            # Connect to the vetted address; Host and SNI keep the name
+            request = self.client.build_request(
+                "GET",
+                url.copy_with(host=address),
+                headers={"Host": url.netloc.decode("ascii")},
+                extensions={"sni_hostname": url.host},
+            )
+            response = await self.client.send(request, stream=True, follow_redirects=False)
+            if not response.is_redirect:
+                return response
+            await response.aclose()
+            url = url.join(response.headers["location"])
+        raise ImageFetchError(f"Too many redirects: {url}")
+
+    async def _fetch(self, url: str) -> str:
+        try:
+            response = await self._open(httpx.URL(url))
+            try:
+                response.raise_for_status()
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > MAX_ORIGINAL_BYTES:
+                        raise ImageFetchError(f"Image too large: {url}")
+                    chunks.append(chunk)
+            finally:
+                await response.aclose()
+        except httpx.InvalidURL as exc:
+            raise ImageFetchError(f"Invalid image URL: {url}") from exc
+        except httpx.HTTPError as exc:
+            raise ImageFetchError(str(exc)) from exc
+
+        original = b"".join(chunks)
+        digest = hashlib.sha256(original).hexdigest()
+        try:
+            thumbnails = await asyncio.to_thread(render_thumbnails, original)
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            raise ImageFetchError(f"Cannot decode image: {url}") from exc
+
+        await asyncio.to_thread(self._write, url, digest, thumbnails)
+        for size, data in thumbnails.items():
+            path = self._thumbnail_path(digest, size)
+            self._total_bytes += len(data) - self._files.pop(path, 0)
+            self._files[path] = len(data)
+            self._evicted.pop(path, None)
+        self._refs[url] = digest
+        self._evict()
+        expired = self._expired()
+        if expired:
+            await asyncio.to_thread(_unlink, expired)
+        return digest
+
+    def _write(self, url: str, digest: str, thumbnails: Dict[str, bytes]) -> None:
+        for size, data in thumbnails.items():
+            path = self._thumbnail_path(digest, size)
+            path.parent.mkdir(exist_ok=True)
+            # Write then rename so readers never see a partial file
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        self._ref_path(url).write_text(digest)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._total_bytes > self.max_bytes and self._files:
+            path, size = self._files.popitem(last=False)
+            self._total_bytes -= size
+            self._evicted[path] = now
+
+    def _expired(self) -> List[Path]:
+        """Evicted files past their grace period, to be deleted."""
+        cutoff = time.monotonic() - EVICTION_GRACE
+        expired = []
+        while self._evicted:
+            path, evicted_at = next(iter(self._evicted.items()))
+            if evicted_at > cutoff:
+                break
+            del self._evicted[path]
+            expired.append(path)
+        return expired
+
+
+def _unlink(paths: List[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+thumbnail_cache = ThumbnailCache(
+    os.getenv("THUMBNAIL_CACHE_DIR", "./thumbnails"),
+    max_bytes=int(os.getenv("THUMBNAIL_CACHE_BYTES", str(1024 * 1024 * 1024))),
+)
@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cluster import ClusterIndex
+from .db import SessionLocal, init_db
+from . import store
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "PapergumIngest/1.0"
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+@dataclass
+class FeedSource:
+    name: str
+    url: str
+
+
+@dataclass
+class FeedState:
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem: Element, *names: str) -> Optional[str]:
+    for child in elem:
+        if _local(child.tag) in names and child.text:
+            return child.text.strip()
+    return None
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)  # RSS, RFC 822
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))  # Atom
+        except ValueError:
+            return None
+    # Stored as naive local time, like the rest of the table
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _entry_to_article(elem: Element, source: FeedSource) -> Optional[dict]:
+    link = None
+    image_url = ""
+    for child in elem:
+        name = _local(child.tag)
+        if name == "link":
+            # Atom links carry the URL in href, RSS links in the text
+            if child.get("href") and child.get("rel", "alternate") == "alternate":
+                link = child.get("href")
+            elif child.text:
+                link = child.text.strip()
+        elif name in ("content", "thumbnail", "enclosure") and not image_url:
+            if child.get("url") and child.get("medium", child.get("type", "image")).startswith("image"):
+                image_url = child.get("url")
+
+    headline = _child_text(elem, "title")
+    guid = _child_text(elem, "guid", "id") or link
+    if not headline or not guid:
+        return None
+
+    summary = _child_text(elem, "description", "summary") or ""
+    published_at = _parse_date(_child_text(elem, "pubDate", "published", "updated"))
+    return {
+        "id": "art-" + hashlib.blake2b(guid.encode(), digest_size=12).hexdigest(),
+        "headline": headline,
+        "image_url": image_url,
+        "source": source.name,
+        # None for undated items; the writer fills in when it was first seen
+        "published_at": published_at,
+        "summary": _TAG_RE.sub("", summary).strip(),
+        "related_sources": [{"source": source.name, "url": link or guid}],
+    }
+
+
+class Ingestor:
+    """Pulls RSS/Atom feeds concurrently and batch-upserts them into the store.
+
+    All fetches share one pooled ``httpx.AsyncClient``; ``per_host`` caps
+    concurrent requests to any single host. Feeds are fetched with the
+    ETag/Last-Modified of the previous response, so unchanged feeds cost a
+    304 and no parsing, and bodies are parsed incrementally as they stream
+    in. Parsed articles go through one writer that upserts them in batches
+    of ``batch_size``, after matching each batch against ``clusters`` to
+    fill in relatedSources and the canonical article of its story. A feed's
+    validators are only kept once its articles are written, so a failed
+    write is retried in full on the next run.
+    """
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        max_connections: int = 100,
+        per_host: int = 4,
+        batch_size: int = 500,
+        timeout: float = 15.0,
+        clusters: Optional[ClusterIndex] = None,
+    ):
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+        self.per_host = per_host
+        self.batch_size = batch_size
+        self.states: Dict[str, FeedState] = {}
+        self.clusters = clusters or ClusterIndex()
+        # Cluster id -> (related_sources, canonical_id) as last written
+        self._stories: Dict[str, Tuple[List[dict], str]] = {}
+        self._clusters_loaded = False
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, source: FeedSource) -> Optional[Tuple[List[dict], FeedState]]:
+        """Return the feed's articles and validators, or None if it is unchanged or failed.
+
+        The validators are not saved here; the caller stores them in
+        ``states`` once the articles have been written.
+        """
+        state = self.states.setdefault(source.url, FeedState())
+        headers = {}
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+
+        # Host first: feeds queued behind a busy host must not sit on
+        # connection slots that other hosts could use
+        async with self._host_limit(source.url), self._slots:
+            try:
+                async with self.client.stream("GET", source.url, headers=headers) as response:
+                    if response.status_code == 304:
+                        return None
+                    response.raise_for_status()
+
+                    articles = []
+                    parser = XMLPullParser(events=("end",))
+                    async for chunk in response.aiter_bytes():
+                        parser.feed(chunk)
+                        for _, elem in parser.read_events():
+                            if _local(elem.tag) in ("item", "entry"):
+                                article = _entry_to_article(elem, source)
+                                if article is not None:
+                                    articles.append(article)
+                                elem.clear()
+                    parser.close()
+            except (httpx.HTTPError, ParseError) as exc:
+                logger.warning("Failed to fetch feed %s: %s", source.url, exc)
+                return None
+
+        validators = FeedState(
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        return articles, validators
+
+    async def _load_clusters(self) -> None:
+        """Index the articles already stored within the clustering window."""
+        async with SessionLocal() as session:
+            articles = await store.list_recent(session, datetime.now() - self.clusters.window)
+        for start in range(0, len(articles), self.batch_size):
+            self.clusters.add_batch([
+                {
+                    "id": article.id,
+                    "headline": article.headline,
+                    "summary": article.summary,
+                    "source": article.source,
+                    "published_at": article.published_at,
+                    "related_sources": article.related_sources,
+                }
+                for article in articles[start:start + self.batch_size]
+            ])
+        self._clusters_loaded = True
+
+    async def _flush(self, pending: Dict[str, dict], validators: Dict[str, FeedState]) -> None:
+        if pending:
+            async with SessionLocal() as session:
+                await self._write(session, pending)
+            pending.clear()
+        self.states.update(validators)
+        validators.clear()
+
+    async def _write(self, session: AsyncSession, pending: Dict[str, dict]) -> None:
+        undated = [article_id for article_id, article in pending.items() if article["published_at"] is None]
+        if undated:
+            # Keep the time an undated item was first seen, so fetching it
+            # again neither moves it to the top nor counts as a change
+            stored = await store.get_articles(session, undated)
+            first_seen = {article.id: article.published_at for article in stored}
+            now = datetime.now()
+            for article_id in undated:
+                pending[article_id]["published_at"] = first_seen.get(article_id, now)
+
+        touched = self.clusters.add_batch(list(pending.values()))
+        stories = {
+            cluster_id: (self.clusters.related_sources(cluster_id), self.clusters.canonical(cluster_id))
+            for cluster_id in touched
+            if self.clusters.has_cluster(cluster_id)
+        }
+        for article in pending.values():
+            article["related_sources"], article["canonical_id"] = stories[
+                self.clusters.cluster_of(article["id"])
+            ]
+
+        # Stored members of a story need rewriting only when the story itself
+        # changed since it was last written; re-fetching an unchanged article
+        # touches its cluster but changes nothing.
+        changed = {
+            cluster_id: story
+            for cluster_id, story in stories.items()
+            if self._stories.get(cluster_id) != story
+        }
+        existing = []
+        for cluster_id, (related, canonical_id) in changed.items():
+            member_ids = [i for i in self.clusters.members(cluster_id) if i not in pending]
+            if member_ids:
+                existing.append((member_ids, related, canonical_id))
+
+        await store.upsert_articles(session, list(pending.values()))
+        await store.update_clusters(session, existing)
+        self._stories.update(changed)
+
+    async def run_once(self, sources: List[FeedSource]) -> dict:
+        queue: "asyncio.Queue[Optional[Tuple[FeedSource, List[dict], FeedState]]]" = asyncio.Queue()
+        stats = {"feeds": len(sources), "changed": 0, "articles": 0}
+        if not self._clusters_loaded:
+            await self._load_clusters()
+        self.clusters.prune()
+        self._stories = {
+            cluster_id: story
+            for cluster_id, story in self._stories.items()
+            if self.clusters.has_cluster(cluster_id)
+        }
+
+        async def produce(source: FeedSource) -> None:
+            result = await self.fetch(source)
+            if result is not None:
+                stats["changed"] += 1
+                await queue.put((source, *result))
+
+        async def consume() -> None:
+            # Keyed by id so an article listed by two feeds is written once
+            pending: Dict[str, dict] = {}
+            validators: Dict[str, FeedState] = {}
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                source, articles, state = item
+                for article in articles:
+                    pending[article["id"]] = article
+                validators[source.url] = state
+                stats["articles"] += len(articles)
+                if len(pending) >= self.batch_size:
+                    await self._flush(pending, validators)
+            await self._flush(pending, validators)
+
+        writer = asyncio.create_task(consume())
+        try:
+            await asyncio.gather(*(produce(source) for source in sources))
+        finally:
+            await queue.put(None)
+            await writer
+        return stats
+
+
+def load_sources(path: str) -> List[FeedSource]:
+    with open(path, encoding="utf-8") as f:
+        return [FeedSource(name=entry["name"], url=entry["url"]) for entry in json.load(f)]
+
+
+async def main() -> None:
+    sources = load_sources(os.getenv("FEEDS_FILE", "feeds.json"))
+    interval = float(os.getenv("INGEST_INTERVAL", "60"))
+    await init_db()
+    ingestor = Ingestor()
+    try:
+        while True:
+            try:
+                stats = await ingestor.run_once(sources)
+            except Exception:
+                # Keep the daemon alive; feeds whose articles were not written
+                # kept their old validators and are fetched again next run
+                logger.exception("Ingest run failed")
+            else:
+                logger.info("Ingested %(articles)d articles from %(changed)d/%(feeds)d changed feeds", stats)
+            if interval <= 0:
+                break
+            await asyncio.sleep(interval)
+    finally:
+        await ingestor.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import atexit
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through roughly ``rate`` of the records; warnings and up always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _InProcessQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats the message here, on the caller's thread,
+        # so it can be pickled. The listener lives in this process, so hand
+        # over the record as-is and let formatting happen there.
+        return record
+
+
+def configure_logging(level: int = logging.INFO) -> QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    The event loop only enqueues records; formatting and stream writes happen
+    on the listener thread, so slow log I/O cannot stall request handling.
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_InProcessQueueHandler(log_queue)]
+    root.setLevel(level)
+    # uvicorn installs its own blocking stream handlers; send its records
+    # (access log included) through the queue as well
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    return listener
+
+
+def sampled_logger(name: str, rate: float) -> logging.Logger:
+    """Logger for per-item messages that would flood the log at full rate."""
+    logger = logging.getLogger(name)
+    logger.addFilter(SamplingFilter(rate))
+    return logger
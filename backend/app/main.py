@@ -1,16 +1,46 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
-import uuid
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import logging
+import os
+
+from .cache import encode, etag_matches, response_cache, response_cache_updater
+from .db import SessionLocal, get_session, init_db
+from .events import CHANGES_BATCH_SIZE, Subscription, broadcaster, format_event, load_changes
+from .images import THUMBNAIL_SIZES, ImageFetchError, thumbnail_cache
+from .logs import configure_logging, sampled_logger
+from .search import search_index, search_updater
+from .seed import MOCK_NEWS
+from . import metrics, store
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
+# Per-article messages, sampled so busy detail traffic does not flood the log
+item_logger = sampled_logger(f"{__name__}.items", float(os.getenv("LOG_ITEM_SAMPLE_RATE", "0.01")))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    async with SessionLocal() as session:
+        await store.seed_articles(session, MOCK_NEWS)
+    await response_cache_updater.start()
+    await broadcaster.start()
+    await search_updater.start()
+    yield
+    await search_updater.stop()
+    await broadcaster.stop()
+    await response_cache_updater.stop()
 
-app = FastAPI(title="Papergum API")
+store.on_change(response_cache_updater.notify)
+store.on_change(broadcaster.notify)
+store.on_change(search_updater.notify)
+
+app = FastAPI(title="Papergum API", lifespan=lifespan)
 
 # Configure CORS with more permissive settings for development
 app.add_middleware(
@@ -21,34 +51,8 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
-
-# Temporary news data for demonstration
-MOCK_NEWS = [
-    {
-        "id": "news-1",
-        "headline": "Neue Regelung für Einwegplastik in der Bundesverwaltung",
-        "imageUrl": "https://images.unsplash.com/photo-1611273426858-450d8e3c9fce",
-        "source": "The Guardian US",
-        "timestamp": (datetime.now() - timedelta(hours=3)).strftime("%d.%m.%Y %H:%M"),
-        "summary": "Die Biden-Administration plant, Einwegplastik, einschließlich Strohhalme, bis 2035 in der gesamten Bundesverwaltung abzuschaffen. Diese Initiative ist Teil eines umfassenderen Umweltschutzprogramms.",
-        "relatedSources": [
-            {"source": "The Guardian US", "url": "https://theguardian.com/news/1"},
-            {"source": "Reuters", "url": "https://reuters.com/news/1"}
-        ]
-    },
-    {
-        "id": "news-2",
-        "headline": "Ehemaliger NFL-Spieler und Trainer Dick Jauron verstorben",
-        "imageUrl": "https://images.unsplash.com/photo-1508098682722-e99c43a406b2",
-        "source": "ESPN",
-        "timestamp": (datetime.now() - timedelta(hours=2)).strftime("%d.%m.%Y %H:%M"),
-        "summary": "Dick Jauron, ein ehemaliger NFL-Spieler und Trainer, ist am Samstag im Alter von 74 Jahren verstorben. Jauron war ein zweifacher Sportstar an der Yale University und hatte eine bemerkenswerte Karriere in der NFL.",
-        "relatedSources": [
-            {"source": "ESPN", "url": "https://espn.com/news/1"},
-            {"source": "NFL", "url": "https://nfl.com/news/1"}
-        ]
-    }
-]
+# Added last so it wraps everything else, CORS included
+app.add_middleware(metrics.MetricsMiddleware)
 
 class RelatedSource(BaseModel):
     source: str
@@ -63,26 +67,169 @@ class NewsDetail(BaseModel):
     summary: str
     relatedSources: List[RelatedSource]
 
+class NewsCard(BaseModel):
+    id: str
+    headline: str
+    imageUrl: str
+    source: str
+    timestamp: str
+
+# `fields=card` is shorthand for exactly what the home page grid renders
+FIELD_PRESETS = {"card": tuple(NewsCard.model_fields)}
+
+def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    if fields is None:
+        return None
+    if fields in FIELD_PRESETS:
+        return FIELD_PRESETS[fields]
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise HTTPException(status_code=400, detail="Keine Felder angegeben")
+    unknown = requested - NewsDetail.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unbekannte Felder: {', '.join(sorted(unknown))}"
+        )
+    # Keep model order so equivalent requests share one cache entry
+    return tuple(name for name in NewsDetail.model_fields if name in requested)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def read_root():
     return {"message": "Willkommen zur Papergum API"}
 
 @app.get("/api/news")
-async def get_news():
-    logger.info("Fetching all news items")
-    return MOCK_NEWS
+async def get_news(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info("Fetching news page")
+    projection = parse_fields(fields)
+    key = (limit, after, projection)
+    cached = response_cache.get_page(key)
+    if cached is None:
+        version = response_cache.version
+        try:
+            articles, next_cursor = await store.list_articles(session, limit, after)
+        except store.InvalidCursor:
+            raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else {}
+        items = [article.to_dict(projection) for article in articles]
+        cached = response_cache.put_page(version, key, encode(items, headers))
+    return cached.to_response(request)
+
+@app.get("/api/news/changes")
+async def get_news_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(CHANGES_BATCH_SIZE, ge=1, le=CHANGES_BATCH_SIZE),
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info("Fetching news changes since: %d", since)
+    return await load_changes(session, since, limit)
+
+@app.get("/api/news/stream")
+async def stream_news_changes(request: Request, since: Optional[int] = Query(None, ge=0)):
+    # EventSource sends Last-Event-ID when it reconnects
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    # Subscribe before loading the backlog so nothing committed in between
+    # is missed; changes may then arrive twice, which clients apply idempotently.
+    subscription = broadcaster.subscribe()
+
+    async def events():
+        try:
+            if since is not None:
+                cursor = since
+                async with SessionLocal() as session:
+                    while True:
+                        payload = await load_changes(session, cursor)
+                        if payload["cursor"] == cursor:
+                            break
+                        cursor = payload["cursor"]
+                        yield format_event(payload)
+                        if not payload["hasMore"]:
+                            break
+            while True:
+                message = await subscription.queue.get()
+                yield message
+                if message is Subscription.OVERFLOW:
+                    break
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/news/search")
+async def search_news(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    logger.info("Searching news for: %s", q)
+    projection = parse_fields(fields)
+    hits = search_index.search(q, limit)
+    articles = await store.get_articles(session, [article_id for article_id, _ in hits])
+    return [article.to_dict(projection) for article in articles]
 
 @app.get("/api/news/{news_id}")
-async def get_news_detail(news_id: str):
-    logger.info(f"Fetching news item with id: {news_id}")
-    news_item = next((item for item in MOCK_NEWS if item["id"] == news_id), None)
-    
-    if news_item is None:
-        logger.warning(f"News item not found: {news_id}")
+async def get_news_detail(
+    news_id: str, request: Request, session: AsyncSession = Depends(get_session)
+):
+    item_logger.info("Fetching news item with id: %s", news_id)
+    cached = response_cache.get_detail(news_id)
+    if cached is None:
+        version = response_cache.version
+        article = await store.get_article(session, news_id)
+
+        if article is None:
+            item_logger.warning("News item not found: %s", news_id)
+            raise HTTPException(
+                status_code=404,
+                detail=f"Artikel mit ID {news_id} wurde nicht gefunden"
+            )
+
+        item_logger.info("Found news item: %s", article.headline)
+        cached = response_cache.put_detail(version, news_id, encode(article.to_dict()))
+    return cached.to_response(request)
+
+@app.get("/api/images/{news_id}/{size}")
+async def get_news_image(
+    news_id: str, size: str, request: Request, session: AsyncSession = Depends(get_session)
+):
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail=f"Unbekannte Bildgröße: {size}")
+    article = await store.get_article(session, news_id)
+    if article is None:
         raise HTTPException(
             status_code=404,
             detail=f"Artikel mit ID {news_id} wurde nicht gefunden"
         )
-    
-    logger.info(f"Found news item: {news_item['headline']}")
-    return news_item
+    if not article.image_url:
+        raise HTTPException(status_code=404, detail="Kein Bild vorhanden")
+
+    try:
+        path = await thumbnail_cache.get(article.image_url, size)
+    except ImageFetchError as exc:
+        logger.warning("Image fetch failed for %s: %s", news_id, exc)
+        raise HTTPException(status_code=502, detail="Bild konnte nicht geladen werden")
+
+    # The file name is the digest of the original, so it doubles as a strong ETag
+    headers = {"ETag": f'"{path.stem}"', "Cache-Control": "public, max-age=604800"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/webp", headers=headers)
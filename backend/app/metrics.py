@@ -0,0 +1,164 @@
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Anything else is reported as "other" so clients cannot mint new series
+KNOWN_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(labels)} {value}" for labels, value in self._values.items())
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, labels: Labels, amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def expose(self) -> List[str]:
+        lines = super().expose()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "papergum_http_request_duration_seconds",
+    "Time from receiving a request to sending the last body byte.",
+    LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "papergum_http_response_size_bytes",
+    "Response body size as sent, after compression.",
+    SIZE_BUCKETS,
+)
+REQUESTS = Counter("papergum_http_requests_total", "Completed requests by status code.")
+IN_FLIGHT = Gauge(
+    "papergum_http_requests_in_flight",
+    "Requests currently being handled, not counting open event streams.",
+)
+EVENT_STREAMS = Gauge("papergum_event_streams_open", "Server-sent event streams currently open.")
+
+REGISTRY = (REQUEST_LATENCY, RESPONSE_SIZE, REQUESTS, IN_FLIGHT, EVENT_STREAMS)
+
+
+def _is_event_stream(headers) -> bool:
+    return any(
+        name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+        for name, value in headers
+    )
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, size and in-flight requests per route.
+
+    Routes are labelled with their path template (``/api/news/{news_id}``)
+    so label cardinality stays bounded; unmatched paths share one label.
+
+    Server-sent event streams stay open for as long as the client listens,
+    so once a response turns out to be one it moves from the in-flight
+    gauge to ``EVENT_STREAMS`` and is left out of the latency and size
+    histograms, where it would swamp the request/response routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        method = scope["method"] if scope["method"] in KNOWN_METHODS else "other"
+        status = "500"
+        size = 0
+        streaming = False
+        IN_FLIGHT.inc((("method", method),))
+
+        async def send_wrapper(message):
+            nonlocal status, size, streaming
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if _is_event_stream(message.get("headers", ())):
+                    streaming = True
+                    IN_FLIGHT.dec((("method", method),))
+                    EVENT_STREAMS.inc(())
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            labels = (("method", method), ("route", path))
+            if streaming:
+                EVENT_STREAMS.dec(())
+            else:
+                IN_FLIGHT.dec((("method", method),))
+                REQUEST_LATENCY.observe(labels, time.perf_counter() - start)
+                RESPONSE_SIZE.observe(labels, size)
+            REQUESTS.inc(labels + (("status", status),))
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import JSON, DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .db import Base
+
+TIMESTAMP_FORMAT = "%d.%m.%Y %H:%M"
+
+
+class Article(Base):
+    __tablename__ = "articles"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    headline: Mapped[str] = mapped_column(String(512))
+    image_url: Mapped[str] = mapped_column(String(1024))
+    source: Mapped[str] = mapped_column(String(128))
+    published_at: Mapped[datetime] = mapped_column(DateTime)
+    summary: Mapped[str] = mapped_column(Text)
+    related_sources: Mapped[list] = mapped_column(JSON, default=list)
+    # Earliest article of the same story across outlets, see app.cluster
+    canonical_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Covers the feed ordering and the keyset predicate of /api/news
+        Index("ix_articles_published_at_id", "published_at", "id"),
+    )
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> dict:
+        data = {
+            "id": self.id,
+            "headline": self.headline,
+            "imageUrl": self.image_url,
+            "source": self.source,
+            "timestamp": self.published_at.strftime(TIMESTAMP_FORMAT),
+            "summary": self.summary,
+            "relatedSources": self.related_sources or [],
+        }
+        if fields is None:
+            return data
+        return {name: data[name] for name in fields}
+
+
+class ArticleChange(Base):
+    """Append-only change log; the autoincrement revision is the change cursor.
+
+    Writers append under a lock held until commit (see
+    ``store._log_changes``), so revisions become visible in increasing order
+    and a reader's cursor never skips an entry that commits later.
+    """
+
+    __tablename__ = "article_changes"
+
+    revision: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    article_id: Mapped[str] = mapped_column(String(64))
+    op: Mapped[str] = mapped_column(String(8))  # "upsert" or "delete"
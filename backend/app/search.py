@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import math
+import re
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from .changelog import ChangeLogFollower
+from .db import SessionLocal
+from .models import Article
+from . import store
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+_UMLAUTS = str.maketrans({"ä": "a", "ö": "o", "ü": "u", "ß": "ss"})
+
+STOPWORDS = frozenset("""
+aber alle allem allen aller alles als also am an ander andere anderem anderen
+anderer anderes auch auf aus bei bin bis bist da damit dann das dass dein
+deine dem den der des dich die dies diese diesem diesen dieser dieses dir doch
+dort du durch ein eine einem einen einer eines er es etwas euch euer für hat
+hatte hatten hier hin ich ihm ihn ihnen ihr ihre im in ist ja jede jedem jeden
+jeder jedes kann kein keine mich mir mit muss nach nicht noch nun nur ob oder
+ohne sehr sein seine sich sie sind so solche soll sondern um und uns unser
+unter vom von vor war waren was weil welche wenn wer werden wie wieder will wir
+wird wo zu zum zur über
+""".split())
+
+
+def stem(word: str) -> str:
+    """Light German stemmer in the spirit of CISTEM.
+
+    Folds umlauts and ß, then strips the common inflectional endings
+    -em/-er/-nd and -e/-s/-n/-t while the word stays long enough.
+    """
+    word = word.translate(_UMLAUTS)
+    while True:
+        if len(word) > 5 and word[-2:] in ("em", "er", "nd"):
+            word = word[:-2]
+        # Keep doubled letters ("strass", "schluss") intact
+        elif len(word) > 4 and word[-1] in "esnt" and word[-1] != word[-2]:
+            word = word[:-1]
+        else:
+            return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        stem(word)
+        for word in _WORD_RE.findall(text.lower())
+        if word not in STOPWORDS
+    ]
+
+
+def _nbytes(entry: Tuple[Optional[np.ndarray], np.ndarray]) -> int:
+    return sum(part.nbytes for part in entry if part is not None)
+
+
+class _ArrayCache:
+    """Per-term NumPy arrays, evicting the least recently used past ``max_bytes``."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Optional[np.ndarray], np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, term: str) -> Optional[Tuple[Optional[np.ndarray], np.ndarray]]:
+        entry = self._entries.get(term)
+        if entry is not None:
+            self._entries.move_to_end(term)
+        return entry
+
+    def put(self, term: str, entry: Tuple[Optional[np.ndarray], np.ndarray]) -> None:
+        self.pop(term)
+        self._entries[term] = entry
+        self._bytes += _nbytes(entry)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= _nbytes(evicted)
+
+    def pop(self, term: str) -> None:
+        entry = self._entries.pop(term, None)
+        if entry is not None:
+            self._bytes -= _nbytes(entry)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+
+def _release(*containers) -> None:
+    """Empty large containers a slice at a time.
+
+    Freeing a big list or dict is a single C call that holds the GIL until
+    it is done; in small steps other threads get to run in between.
+    """
+    for container in containers:
+        if isinstance(container, dict):
+            while container:
+                for _ in range(min(1024, len(container))):
+                    container.popitem()
+        else:
+            while container:
+                del container[-1024:]
+
+
+def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Doc numbers of the ``limit`` best positive scores, best first."""
+    # The limit-th best score of a strided sample can only be below the
+    # limit-th best overall, so entries under it cannot make the cut. That
+    # leaves a short candidate list instead of selecting among all matches.
+    sample = scores[::64]
+    cut = np.partition(sample, -limit)[-limit] if len(sample) > limit else 0
+    candidates = np.flatnonzero(scores >= cut) if cut > 0 else np.flatnonzero(scores)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(scores[candidates], -limit)[-limit:]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class SearchIndex:
+    """In-memory BM25 index over article headline and summary.
+
+    Postings are stored column-wise: each term maps to a slot, and per slot
+    there is an ``array('I')`` of doc-number gaps, an ``array('H')`` of term
+    frequencies and the last doc number. Doc numbers are handed out in
+    increasing order, so appending keeps every list sorted and every gap
+    small. Flat lists of arrays also give the cyclic GC nothing to traverse.
+
+    Updating an article retires its old doc number and indexes it under a
+    fresh one; retired entries score zero and are dropped by ``compact`` once
+    they make up a large share of the index.
+
+    Queries work from two per-term caches, each bounded by ``cache_bytes``:
+    decoded postings, kept until the term gets a new posting, and each term's
+    BM25 contribution per document, kept until the next write (every write
+    shifts N and the average length). Terms found in more than one document
+    in ``DENSE_RATIO`` keep that contribution as a vector over all doc
+    numbers, since adding it costs less than scattering into the scores.
+    """
+
+    DENSE_RATIO = 8
+
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        headline_weight: int = 2,
+        cache_bytes: int = 128 * 1024 * 1024,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.headline_weight = headline_weight
+        self.cursor = 0
+        self._slots: Dict[str, int] = {}
+        self._gaps: List[array] = []
+        self._tfs: List[array] = []
+        self._lasts = array("I")
+        self._ids: List[Optional[str]] = []
+        self._docnums: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._alive = bytearray()
+        self._total_length = 0
+        self._decoded = _ArrayCache(cache_bytes)
+        self._impacts = _ArrayCache(cache_bytes)
+
+    def __len__(self) -> int:
+        return len(self._docnums)
+
+    def add(self, article_id: str, headline: str, summary: str) -> None:
+        self.remove(article_id)
+        tokens = tokenize(headline) * self.headline_weight + tokenize(summary)
+        docnum = len(self._ids)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            slot = self._slots.get(term)
+            if slot is None:
+                slot = self._slots[term] = len(self._gaps)
+                self._gaps.append(array("I"))
+                self._tfs.append(array("H"))
+                self._lasts.append(0)
+            self._gaps[slot].append(docnum - self._lasts[slot])
+            self._tfs[slot].append(min(tf, 0xFFFF))
+            self._lasts[slot] = docnum
+            self._decoded.pop(term)
+
+        self._ids.append(article_id)
+        self._docnums[article_id] = docnum
+        self._lengths.append(len(tokens))
+        self._alive.append(1)
+        self._total_length += len(tokens)
+        self._impacts.clear()
+
+    def remove(self, article_id: str) -> None:
+        docnum = self._docnums.pop(article_id, None)
+        if docnum is None:
+            return
+        self._alive[docnum] = 0
+        self._ids[docnum] = None
+        self._total_length -= self._lengths[docnum]
+        self._impacts.clear()
+
+    def _postings(self, slot: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc numbers and term frequencies of a slot, as new arrays.
+
+        Copies, not views: an exported buffer would make the next append fail.
+        """
+        docs = np.cumsum(np.frombuffer(self._gaps[slot], dtype=np.uint32), dtype=np.uint32)
+        return docs, np.array(self._tfs[slot], dtype=np.uint16)
+
+    def _decode(self, term: str, slot: int) -> Tuple[np.ndarray, np.ndarray]:
+        decoded = self._decoded.get(term)
+        if decoded is None:
+            docs, tfs = self._postings(slot)
+            decoded = (docs, tfs.astype(np.float32))
+            self._decoded.put(term, decoded)
+        return decoded
+
+    def _impact(self, term: str) -> Optional[Tuple[Optional[np.ndarray], np.ndarray]]:
+        """(doc numbers, weights) of ``term``, or (None, dense weights)."""
+        impact = self._impacts.get(term)
+        if impact is not None:
+            return impact
+        slot = self._slots.get(term)
+        if slot is None:
+            return None
+
+        docs, tfs = self._decode(term, slot)
+        # Retired doc numbers still sit in the postings until compaction, so
+        # count them in N as well to keep idf positive.
+        num_docs = len(self._ids)
+        idf = math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)[docs]
+        avgdl = self._total_length / max(len(self._docnums), 1) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths.astype(np.float32) / np.float32(avgdl))
+        weights = tfs * np.float32(idf * (self.k1 + 1)) / (tfs + norm)
+        weights[np.frombuffer(self._alive, dtype=np.uint8)[docs] == 0] = 0
+
+        if len(docs) * self.DENSE_RATIO > num_docs:
+            dense = np.zeros(num_docs, dtype=np.float32)
+            dense[docs] = weights
+            impact = (None, dense)
+        else:
+            impact = (docs, weights)
+        self._impacts.put(term, impact)
+        return impact
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        if not terms or not self._docnums:
+            return []
+
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        for term in terms:
+            impact = self._impact(term)
+            if impact is None:
+                continue
+            docs, weights = impact
+            if docs is None:
+                scores += weights
+            else:
+                scores[docs] += weights
+
+        return [(self._ids[docnum], float(scores[docnum])) for docnum in _top_k(scores, limit)]
+
+    def needs_compaction(self) -> bool:
+        retired = len(self._ids) - len(self._docnums)
+        return retired > 1000 and retired > len(self._ids) // 4
+
+    async def compact(self) -> None:
+        """Drop retired doc numbers and renumber the live ones densely.
+
+        The new arrays are built in a worker thread and swapped in with a few
+        assignments, so searches keep running on the old ones meanwhile. The
+        old structures are freed in the worker thread as well. The caller must
+        not add or remove documents until it returns.
+        """
+        compacted = await asyncio.to_thread(self._compacted)
+        old = (self._slots, self._gaps, self._tfs, self._ids, self._docnums)
+        (self._slots, self._gaps, self._tfs, self._lasts,
+         self._ids, self._docnums, self._lengths) = compacted
+        self._alive = bytearray(b"\x01" * len(self._ids))
+        self._decoded.clear()
+        self._impacts.clear()
+        await asyncio.to_thread(_release, *old)
+
+    def _compacted(self) -> tuple:
+        """Build the compacted structures; reads the index and changes nothing."""
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(alive, dtype=np.int64) - 1
+        slots: Dict[str, int] = {}
+        gaps: List[array] = []
+        tfs: List[array] = []
+        lasts = array("I")
+        for term, slot in self._slots.items():
+            docs, term_tfs = self._postings(slot)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            new_docs = renumber[docs[keep]]
+            slots[term] = len(gaps)
+            gaps.append(array("I", np.diff(new_docs, prepend=0).astype(np.uint32).tobytes()))
+            tfs.append(array("H", term_tfs[keep].tobytes()))
+            lasts.append(int(new_docs[-1]))
+
+        ids = [article_id for article_id in self._ids if article_id is not None]
+        docnums = {article_id: docnum for docnum, article_id in enumerate(ids)}
+        lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[alive].tobytes())
+        return slots, gaps, tfs, lasts, ids, docnums, lengths
+
+    def apply(self, upserted: Iterable[Article], removed: Iterable[str]) -> None:
+        for article in upserted:
+            self.add(article.id, article.headline, article.summary)
+        for article_id in removed:
+            self.remove(article_id)
+
+
+class SearchUpdater(ChangeLogFollower):
+    """Keeps a SearchIndex in step with the article change log.
+
+    Builds the index from the store in the background once started, so a
+    large corpus does not hold up startup (searches see a partial index
+    until the build finishes), then applies each batch of changes after the
+    index cursor.
+    """
+
+    def __init__(self, index: SearchIndex, poll_interval: float = 5.0, batch_size: int = 2000):
+        super().__init__(poll_interval)
+        self.index = index
+        self.batch_size = batch_size
+
+    async def _prepare(self) -> None:
+        async with SessionLocal() as session:
+            # Take the cursor first; changes made while loading are replayed,
+            # which is harmless since applying them is idempotent.
+            self.index.cursor = await store.current_revision(session)
+            last_id = ""
+            while True:
+                stmt = (
+                    select(Article.id, Article.headline, Article.summary)
+                    .where(Article.id > last_id)
+                    .order_by(Article.id)
+                    .limit(self.batch_size)
+                )
+                rows = (await session.execute(stmt)).all()
+                if not rows:
+                    break
+                for article_id, headline, summary in rows:
+                    self.index.add(article_id, headline, summary)
+                last_id = rows[-1][0]
+                # Let requests through between batches of a large corpus
+                await asyncio.sleep(0)
+        logger.info("Search index built with %d articles", len(self.index))
+
+    async def _catch_up(self) -> None:
+        async with SessionLocal() as session:
+            has_more = True
+            while has_more:
+                upserted, removed, cursor, has_more = await store.list_changes(
+                    session, self.index.cursor, self.batch_size
+                )
+                self.index.apply(upserted, removed)
+                self.index.cursor = cursor
+        # Only this task modifies the index, so nothing changes it while the
+        # compacted copy is being built
+        if self.index.needs_compaction():
+            await self.index.compact()
+
+
+search_index = SearchIndex()
+search_updater = SearchUpdater(search_index)
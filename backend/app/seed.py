@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+# Temporary news data for demonstration
+MOCK_NEWS = [
+    {
+        "id": "news-1",
+        "headline": "Neue Regelung für Einwegplastik in der Bundesverwaltung",
+        "image_url": "https://images.unsplash.com/photo-1611273426858-450d8e3c9fce",
+        "source": "The Guardian US",
+        "published_at": datetime.now() - timedelta(hours=3),
+        "summary": "Die Biden-Administration plant, Einwegplastik, einschließlich Strohhalme, bis 2035 in der gesamten Bundesverwaltung abzuschaffen. Diese Initiative ist Teil eines umfassenderen Umweltschutzprogramms.",
+        "related_sources": [
+            {"source": "The Guardian US", "url": "https://theguardian.com/news/1"},
+            {"source": "Reuters", "url": "https://reuters.com/news/1"}
+        ]
+    },
+    {
+        "id": "news-2",
+        "headline": "Ehemaliger NFL-Spieler und Trainer Dick Jauron verstorben",
+        "image_url": "https://images.unsplash.com/photo-1508098682722-e99c43a406b2",
+        "source": "ESPN",
+        "published_at": datetime.now() - timedelta(hours=2),
+        "summary": "Dick Jauron, ein ehemaliger NFL-Spieler und Trainer, ist am Samstag im Alter von 74 Jahren verstorben. Jauron war ein zweifacher Sportstar an der Yale University und hatte eine bemerkenswerte Karriere in der NFL.",
+        "related_sources": [
+            {"source": "ESPN", "url": "https://espn.com/news/1"},
+            {"source": "NFL", "url": "https://nfl.com/news/1"}
+        ]
+    }
+]
@@ -0,0 +1,247 @@
+import base64
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import JSON, Text, cast, delete, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Article, ArticleChange
+
+# Rows per INSERT statement, well below SQLite's bound-parameter limit
+UPSERT_CHUNK_SIZE = 500
+
+
+# Key of the PostgreSQL advisory lock that serializes change-log writers
+CHANGE_LOG_LOCK_KEY = 0x706170657267756D  # "papergum"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+_change_listeners: List[Callable[[Iterable[str]], None]] = []
+
+
+def on_change(listener: Callable[[Iterable[str]], None]) -> None:
+    """Register a callback invoked with the ids of articles after each write."""
+    _change_listeners.append(listener)
+
+
+def _notify(article_ids: List[str]) -> None:
+    for listener in _change_listeners:
+        listener(article_ids)
+
+
+def encode_cursor(article: Article) -> str:
+    raw = f"{article.published_at.isoformat()}|{article.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        published_at, article_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(published_at), article_id
+    except ValueError as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+async def get_article(session: AsyncSession, article_id: str) -> Optional[Article]:
+    return await session.get(Article, article_id)
+
+
+async def get_articles(session: AsyncSession, article_ids: List[str]) -> List[Article]:
+    """Return the stored articles among ``article_ids``, in the given order."""
+    rows = await session.scalars(select(Article).where(Article.id.in_(article_ids)))
+    by_id = {article.id: article for article in rows.all()}
+    return [by_id[article_id] for article_id in article_ids if article_id in by_id]
+
+
+async def list_articles(
+    session: AsyncSession, limit: int, after: Optional[str] = None
+) -> Tuple[List[Article], Optional[str]]:
+    """Return one feed page, newest first, plus the cursor for the next page.
+
+    Pages are addressed by keyset on (published_at, id) so every page is an
+    index range scan, no matter how deep the client has paged.
+    """
+    stmt = select(Article).order_by(Article.published_at.desc(), Article.id.desc())
+    if after is not None:
+        published_at, article_id = decode_cursor(after)
+        stmt = stmt.where(
+            tuple_(Article.published_at, Article.id) < tuple_(published_at, article_id)
+        )
+
+    # Fetch one extra row to learn whether another page exists
+    rows = list((await session.scalars(stmt.limit(limit + 1))).all())
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+async def _log_changes(session: AsyncSession, article_ids: List[str], op: str) -> None:
+    """Append change-log entries inside the caller's transaction.
+
+    Revisions are assigned when the row is inserted, not when it commits. If
+    two writers overlapped, a reader could see revision 11 committed while
+    10 was still pending, move its cursor past 10 and never see it. So
+    writers serialize from their first log entry until commit, which makes
+    revisions commit in order. SQLite allows a single writer at a time
+    anyway; on PostgreSQL a transaction-scoped advisory lock does the same.
+    """
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK_KEY)))
+    await session.execute(
+        insert(ArticleChange),
+        [{"article_id": article_id, "op": op} for article_id in article_ids],
+    )
+
+
+async def upsert_articles(session: AsyncSession, items: List[dict]) -> List[str]:
+    """Insert or update articles in bulk and record them in the change log.
+
+    Rows whose stored values already match are left alone, so re-ingesting an
+    unchanged feed produces no change-log entries. Returns the ids that were
+    actually inserted or modified.
+    """
+    if not items:
+        return []
+    dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+    columns = [column for column in Article.__table__.columns if column.name != "id"]
+
+    article_ids = []
+    for start in range(0, len(items), UPSERT_CHUNK_SIZE):
+        stmt = dialect.insert(Article).values(items[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Article.id],
+            set_={column.name: stmt.excluded[column.name] for column in columns},
+            # JSON has no equality operator on PostgreSQL, so compare as text
+            where=or_(*(
+                cast(column, Text).is_distinct_from(cast(stmt.excluded[column.name], Text))
+                for column in columns
+            )),
+        ).returning(Article.id)
+        article_ids.extend((await session.scalars(stmt)).all())
+
+    if article_ids:
+        await _log_changes(session, article_ids, "upsert")
+    await session.commit()
+    if article_ids:
+        _notify(article_ids)
+    return article_ids
+
+
+async def update_clusters(
+    session: AsyncSession, stories: List[Tuple[List[str], List[dict], str]]
+) -> List[str]:
+    """Set related_sources and canonical_id of stored articles, one story at a time.
+
+    Each entry is (article_ids, related_sources, canonical_id). Ids that are
+    no longer stored are skipped, and rows that already hold these values are
+    left alone, so only real changes reach the change log. Returns the ids
+    that were actually modified.
+    """
+    if not stories:
+        return []
+    article_ids = []
+    for member_ids, related, canonical_id in stories:
+        stmt = (
+            update(Article)
+            .where(Article.id.in_(member_ids))
+            .where(or_(
+                # Compared as text, like upsert_articles
+                cast(Article.related_sources, Text).is_distinct_from(cast(literal(related, JSON), Text)),
+                Article.canonical_id.is_distinct_from(canonical_id),
+            ))
+            .values(related_sources=related, canonical_id=canonical_id)
+            .returning(Article.id)
+            .execution_options(synchronize_session=False)
+        )
+        article_ids.extend((await session.scalars(stmt)).all())
+
+    if article_ids:
+        await _log_changes(session, article_ids, "upsert")
+    await session.commit()
+    if article_ids:
+        _notify(article_ids)
+    return article_ids
+
+
+async def delete_articles(session: AsyncSession, article_ids: List[str]) -> None:
+    if not article_ids:
+        return
+    await session.execute(delete(Article).where(Article.id.in_(article_ids)))
+    await _log_changes(session, article_ids, "delete")
+    await session.commit()
+    _notify(article_ids)
+
+
+async def list_recent(session: AsyncSession, since: datetime) -> List[Article]:
+    stmt = select(Article).where(Article.published_at >= since).order_by(Article.published_at)
+    return list((await session.scalars(stmt)).all())
+
+
+async def current_revision(session: AsyncSession) -> int:
+    return await session.scalar(select(func.max(ArticleChange.revision))) or 0
+
+
+async def _read_changes(
+    session: AsyncSession, since: int, limit: int
+) -> Tuple[List[ArticleChange], bool]:
+    stmt = (
+        select(ArticleChange)
+        .where(ArticleChange.revision > since)
+        .order_by(ArticleChange.revision)
+        .limit(limit + 1)
+    )
+    entries = list((await session.scalars(stmt)).all())
+    return entries[:limit], len(entries) > limit
+
+
+async def list_changed_ids(
+    session: AsyncSession, since: int, limit: int
+) -> Tuple[List[str], int, bool]:
+    """Like ``list_changes`` but only the ids, without loading the articles.
+
+    Returns (article_ids, cursor, has_more).
+    """
+    entries, has_more = await _read_changes(session, since, limit)
+    if not entries:
+        return [], since, False
+    article_ids = list(dict.fromkeys(entry.article_id for entry in entries))
+    return article_ids, entries[-1].revision, has_more
+
+
+async def list_changes(
+    session: AsyncSession, since: int, limit: int
+) -> Tuple[List[Article], List[str], int, bool]:
+    """Return articles upserted and ids removed after revision ``since``.
+
+    Changes are read in revision order, at most ``limit`` log entries at a
+    time, and collapsed so each article appears once with its latest state.
+    Returns (upserted, removed, cursor, has_more).
+    """
+    entries, has_more = await _read_changes(session, since, limit)
+    if not entries:
+        return [], [], since, False
+
+    latest = {}
+    for entry in entries:
+        latest[entry.article_id] = entry.op
+    upserted_ids = [article_id for article_id, op in latest.items() if op == "upsert"]
+    removed = [article_id for article_id, op in latest.items() if op == "delete"]
+
+    upserted = []
+    if upserted_ids:
+        rows = await session.scalars(select(Article).where(Article.id.in_(upserted_ids)))
+        upserted = list(rows.all())
+    return upserted, removed, entries[-1].revision, has_more
+
+
+async def seed_articles(session: AsyncSession, items: List[dict]) -> None:
+    count = await session.scalar(select(func.count()).select_from(Article))
+    if count:
+        return
+    await upsert_articles(session, items)
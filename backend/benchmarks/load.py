@@ -0,0 +1,233 @@
+"""In-process load test for the Papergum API.
+
+Drives the ASGI app through httpx's ASGI transport (no sockets) with many
+concurrent virtual clients against a synthetic corpus in a throwaway SQLite
+database, then reports throughput and latency percentiles per request kind
+and writes them to JSON for comparison between commits.
+
+    cd backend
+    python -m benchmarks.load --articles 20000 --clients 200 --duration 30
+    python -m benchmarks.load --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+DEFAULT_MIX = "list=45,page=10,detail=25,missing=5,search=10,changes=5"
+
+_WORDS = (
+    "Bundesregierung Kabinett Gesetz Klimaschutz Wahl Bundestag Haushalt Energie "
+    "Inflation Zinsen Börse Unternehmen Streik Bahn Verkehr Schule Gesundheit Klinik "
+    "Polizei Gericht Urteil Europa Brüssel Ukraine Russland China Amerika Handel "
+    "Export Fußball Bundesliga Trainer Spieler Meisterschaft Olympia Wetter Sturm "
+    "Hochwasser Hitze Wissenschaft Forschung Studie Universität Digitalisierung "
+    "Internet Datenschutz Kultur Theater Film Musik Festival Berlin München Hamburg"
+).split()
+
+
+def synthetic_articles(count: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    now = datetime.now()
+    articles = []
+    for i in range(count):
+        headline = " ".join(rng.choices(_WORDS, k=rng.randint(5, 10)))
+        summary = " ".join(rng.choices(_WORDS, k=rng.randint(25, 45))) + "."
+        articles.append({
+            "id": f"bench-{i}",
+            "headline": headline,
+            "image_url": f"https://images.example.com/{i}.jpg",
+            "source": rng.choice(("Reuters", "dpa", "Spiegel", "Zeit", "ESPN")),
+            "published_at": now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600)),
+            "summary": summary,
+            "related_sources": [{"source": "Reuters", "url": f"https://reuters.com/{i}"}],
+        })
+    return articles
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = int(weight)
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: List[Tuple[float, int]], elapsed: float) -> dict:
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, status in samples if status >= 500)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # The app reads its configuration on import, so point it at a scratch
+    # database and cache directory first.
+    workdir = tempfile.mkdtemp(prefix="papergum-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ["THUMBNAIL_CACHE_DIR"] = f"{workdir}/thumbnails"
+
+    import httpx
+
+    from app import store
+    from app.db import SessionLocal, engine, init_db
+    from app.main import app, lifespan
+    from app.search import search_index
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    articles = synthetic_articles(args.articles, args.seed)
+    await init_db()
+    async with SessionLocal() as session:
+        await store.upsert_articles(session, articles)
+
+    mix = parse_mix(args.mix)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    rng = random.Random(args.seed)
+
+    async with lifespan(app):
+        # The search index builds in the background; wait so search requests
+        # measure lookups, not a half-built index.
+        while len(search_index) < len(articles):
+            await asyncio.sleep(0.1)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            first_page = await client.get("/api/news", params={"limit": args.page_size})
+            next_cursor = first_page.headers.get("x-next-cursor")
+            revision = len(articles)
+
+            def build_request(kind: str) -> Tuple[str, dict]:
+                if kind == "list":
+                    return "/api/news", {"limit": args.page_size, "fields": "card"}
+                if kind == "page":
+                    params = {"limit": args.page_size, "fields": "card"}
+                    if next_cursor:
+                        params["after"] = next_cursor
+                    return "/api/news", params
+                if kind == "detail":
+                    return f"/api/news/{rng.choice(articles)['id']}", {}
+                if kind == "missing":
+                    return f"/api/news/missing-{rng.randrange(1 << 30)}", {}
+                if kind == "search":
+                    return "/api/news/search", {"q": " ".join(rng.sample(_WORDS, 2)), "fields": "card"}
+                if kind == "changes":
+                    return "/api/news/changes", {"since": max(0, revision - rng.randint(1, 500)), "limit": 100}
+                raise ValueError(f"Unknown request kind: {kind}")
+
+            samples: Dict[str, List[Tuple[float, int]]] = {kind: [] for kind in kinds}
+            deadline = time.perf_counter() + args.duration
+
+            async def virtual_client() -> None:
+                while time.perf_counter() < deadline:
+                    kind = rng.choices(kinds, weights)[0]
+                    path, params = build_request(kind)
+                    start = time.perf_counter()
+                    response = await client.get(path, params=params)
+                    samples[kind].append((time.perf_counter() - start, response.status_code))
+                    if args.think_time:
+                        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_client() for _ in range(args.clients)))
+            elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    all_samples = [sample for kind_samples in samples.values() for sample in kind_samples]
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "articles": args.articles,
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "page_size": args.page_size,
+            "think_time_s": args.think_time,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(all_samples, elapsed),
+        "by_kind": {kind: summarize(kind_samples, elapsed) for kind, kind_samples in samples.items()},
+    }
+
+
+def print_report(result: dict, baseline: dict = None) -> None:
+    print(f"commit {result['commit']}  {result['config']['articles']} articles, "
+          f"{result['config']['clients']} clients, {result['elapsed_s']}s")
+    header = f"{'kind':<10}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    rows = [("overall", result["overall"])] + list(result["by_kind"].items())
+    for kind, stats in rows:
+        line = (f"{kind:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10}"
+                f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+        if baseline is not None:
+            before = baseline["overall"] if kind == "overall" else baseline["by_kind"].get(kind)
+            if before and before["p99_ms"] and before["throughput_rps"]:
+                p99 = (stats["p99_ms"] / before["p99_ms"] - 1) * 100
+                rps = (stats["throughput_rps"] / before["throughput_rps"] - 1) * 100
+                line += f"   p99 {p99:+.1f}%  rps {rps:+.1f}% vs {baseline['commit']}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=10_000, help="synthetic corpus size")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a client's requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"request weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    output = Path(args.output or f"benchmarks/results/{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import tempfile
+
+# The app reads its configuration on import, so point it at a scratch
+# database and cache directory before anything imports it.
+_workdir = tempfile.mkdtemp(prefix="papergum-test-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir}/test.db"
+os.environ["THUMBNAIL_CACHE_DIR"] = f"{_workdir}/thumbnails"
+
+import pytest
+
+from app.db import Base, engine, init_db
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    # One loop for the whole run: the app's module-level singletons create
+    # asyncio primitives that stay bound to the loop they were first used on.
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(event_loop):
+    """Run coroutines on the test loop against freshly created tables."""
+
+    async def reset() -> None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await init_db()
+
+    event_loop.run_until_complete(reset())
+    yield event_loop.run_until_complete
+    event_loop.run_until_complete(engine.dispose())
@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+from app.main import app, lifespan
+
+
+def get(run, path: str, **kwargs) -> httpx.Response:
+    async def request():
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(path, **kwargs)
+
+    return run(request())
+
+
+def test_fields_card_projects_the_list(run):
+    response = get(run, "/api/news", params={"fields": "card"})
+    assert response.status_code == 200
+    assert set(response.json()[0]) == {"id", "headline", "imageUrl", "source", "timestamp"}
+
+
+@pytest.mark.parametrize("fields", ["", ",", "headline,nope"])
+def test_fields_rejects_empty_or_unknown_projection(run, fields):
+    assert get(run, "/api/news", params={"fields": fields}).status_code == 400
+
+
+def test_large_list_is_brotli_compressed(run):
+    response = get(run, "/api/news", params={"limit": 100}, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"].endswith('-br"')
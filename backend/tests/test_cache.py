@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+from sqlalchemy import insert, update
+
+from app.cache import response_cache_updater
+from app.db import SessionLocal
+from app.main import app, lifespan
+from app.models import Article, ArticleChange
+
+
+async def write_elsewhere(article_id: str, headline: str) -> None:
+    # What app.ingest does from its own process: no in-process notification
+    async with SessionLocal() as session:
+        await session.execute(update(Article).where(Article.id == article_id).values(headline=headline))
+        await session.execute(insert(ArticleChange).values(article_id=article_id, op="upsert"))
+        await session.commit()
+
+
+def test_cache_follows_writes_from_other_processes(run, monkeypatch):
+    monkeypatch.setattr(response_cache_updater, "poll_interval", 0.05)
+
+    async def scenario():
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                page = await client.get("/api/news")
+                detail = await client.get("/api/news/news-1")
+                assert (await client.get("/api/news")).headers["etag"] == page.headers["etag"]
+
+                await write_elsewhere("news-1", "Geänderte Schlagzeile")
+                await asyncio.sleep(0.3)
+
+                page_after = await client.get("/api/news")
+                detail_after = await client.get(
+                    "/api/news/news-1", headers={"If-None-Match": detail.headers["etag"]}
+                )
+                return page, page_after, detail_after
+
+    page, page_after, detail_after = run(scenario())
+    assert page_after.headers["etag"] != page.headers["etag"]
+    assert "Geänderte Schlagzeile" in page_after.text
+    assert detail_after.status_code == 200
+    assert detail_after.json()["headline"] == "Geänderte Schlagzeile"
@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+from starlette.requests import Request
+
+from app import events, main, store
+from app.db import SessionLocal
+from app.events import Broadcaster, Subscription, broadcaster
+
+START = datetime(2024, 3, 1, 12, 0)
+
+
+def make_article(article_id: str, minute: int = 0, headline: str = "Schlagzeile") -> dict:
+    return {
+        "id": article_id,
+        "headline": f"{headline} {article_id}",
+        "image_url": "",
+        "source": "dpa",
+        "published_at": START + timedelta(minutes=minute),
+        "summary": "",
+        "related_sources": [],
+    }
+
+
+async def revision() -> int:
+    async with SessionLocal() as session:
+        return await store.current_revision(session)
+
+
+async def write(articles=(), deleted=()) -> None:
+    async with SessionLocal() as session:
+        await store.upsert_articles(session, list(articles))
+        await store.delete_articles(session, list(deleted))
+
+
+def parse_event(message: bytes) -> dict:
+    lines = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    payload = json.loads(lines["data"])
+    assert lines["event"] == "changes" and int(lines["id"]) == payload["cursor"]
+    return payload
+
+
+def test_delta_endpoint_pages_and_collapses_changes(run):
+    async def scenario():
+        async with main.lifespan(main.app):
+            since = await revision()
+            await write([make_article(f"c-{i}", i) for i in range(5)])
+            # c-0 is updated and then deleted, c-1 updated: one entry each in the delta
+            await write([make_article("c-0", headline="Neu"), make_article("c-1", headline="Neu")])
+            await write(deleted=["c-0"])
+
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                whole = (await client.get("/api/news/changes", params={"since": since})).json()
+                pages, cursor = [], since
+                while True:
+                    page = (await client.get("/api/news/changes", params={"since": cursor, "limit": 3})).json()
+                    pages.append(page)
+                    cursor = page["cursor"]
+                    if not page["hasMore"]:
+                        break
+                caught_up = (await client.get("/api/news/changes", params={"since": cursor})).json()
+                return since, whole, pages, caught_up
+
+    since, whole, pages, caught_up = run(scenario())
+    # 5 inserts, 2 updates, 1 delete
+    assert whole["cursor"] == since + 8 and not whole["hasMore"]
+    assert sorted(a["id"] for a in whole["upserted"]) == ["c-1", "c-2", "c-3", "c-4"]
+    assert next(a for a in whole["upserted"] if a["id"] == "c-1")["headline"] == "Neu c-1"
+    assert whole["removed"] == ["c-0"]
+
+    assert [page["hasMore"] for page in pages] == [True, True, False]
+    assert [page["cursor"] for page in pages] == [since + 3, since + 6, since + 8]
+    assert caught_up == {"cursor": since + 8, "hasMore": False, "upserted": [], "removed": []}
+
+
+def test_broadcaster_pushes_each_change_to_every_subscriber(run):
+    async def scenario():
+        async with main.lifespan(main.app):
+            first, second = broadcaster.subscribe(), broadcaster.subscribe()
+            try:
+                before = await revision()
+                await write([make_article("b-1")])
+                messages = [
+                    await asyncio.wait_for(subscription.queue.get(), 2)
+                    for subscription in (first, second)
+                ]
+                return before, messages
+            finally:
+                broadcaster.unsubscribe(first)
+                broadcaster.unsubscribe(second)
+
+    before, messages = run(scenario())
+    # Encoded once and shared
+    assert messages[0] is messages[1]
+    payload = parse_event(messages[0])
+    assert payload["cursor"] == before + 1
+    assert [a["id"] for a in payload["upserted"]] == ["b-1"]
+
+
+def test_subscriber_that_falls_behind_gets_a_reset():
+    subscription = Subscription(maxsize=2)
+    assert subscription.push(b"one") and subscription.push(b"two")
+    # The oldest message makes room for the reset notice
+    assert not subscription.push(b"three")
+    assert not subscription.push(b"four")
+    assert [subscription.queue.get_nowait() for _ in range(2)] == [b"two", Subscription.OVERFLOW]
+    assert subscription.queue.empty()
+
+
+def test_broadcaster_drops_overflowed_subscribers():
+    fan_out = Broadcaster(queue_size=1)
+    slow, fast = fan_out.subscribe(), fan_out.subscribe()
+    fan_out._publish(b"one")
+    fast.queue.get_nowait()
+    fan_out._publish(b"two")
+    assert fan_out.subscribers == {fast}
+    assert slow.queue.get_nowait() is Subscription.OVERFLOW
+
+
+def stream_request(headers=()) -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/news/stream",
+        "query_string": b"",
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+    return Request(scope)
+
+
+def test_stream_replays_backlog_from_since_or_last_event_id(run, monkeypatch):
+    # Small batches so the backlog spans several events
+    monkeypatch.setattr(main, "load_changes", functools.partial(events.load_changes, limit=2))
+
+    async def read(response, count: int) -> list:
+        # ASGITransport buffers streaming bodies, so drive the generator directly
+        events = response.body_iterator
+        try:
+            return [parse_event(await asyncio.wait_for(events.__anext__(), 2)) for _ in range(count)]
+        finally:
+            await events.aclose()
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            since = await revision()
+            await write([make_article(f"s-{i}", i) for i in range(5)])
+            # Let the broadcaster pass these with nobody subscribed, so live
+            # pushes below start after them
+            await asyncio.sleep(0.05)
+            by_query = await read(await main.stream_news_changes(stream_request(), since), 3)
+            # Last-Event-ID wins over the query parameter
+            resumed = await read(
+                await main.stream_news_changes(stream_request([("last-event-id", str(since + 4))]), since),
+                1,
+            )
+            # After the backlog the stream switches to live pushes
+            live = await main.stream_news_changes(stream_request(), since + 5)
+            pushed = asyncio.ensure_future(read(live, 1))
+            await asyncio.sleep(0.05)
+            await write([make_article("s-live")])
+            return since, by_query, resumed, await pushed, len(broadcaster.subscribers)
+
+    since, by_query, resumed, pushed, subscribers = run(scenario())
+    assert [event["cursor"] for event in by_query] == [since + 2, since + 4, since + 5]
+    assert [a["id"] for event in by_query for a in event["upserted"]] == [f"s-{i}" for i in range(5)]
+    assert [a["id"] for a in resumed[0]["upserted"]] == ["s-4"]
+    assert [a["id"] for a in pushed[0]["upserted"]] == ["s-live"]
+    # Closed streams unsubscribe
+    assert subscribers == 0
+
+
+def test_concurrent_writers_never_let_a_reader_skip_a_revision(run):
+    async def scenario():
+        since = await revision()
+        seen, done = [], False
+
+        async def follow():
+            cursor = since
+            while True:
+                finished = done
+                async with SessionLocal() as session:
+                    ids, next_cursor, has_more = await store.list_changed_ids(session, cursor, 1000)
+                seen.extend(ids)
+                cursor = next_cursor
+                if finished and not has_more:
+                    return
+                await asyncio.sleep(0)
+
+        reader = asyncio.ensure_future(follow())
+        await asyncio.gather(*(write([make_article(f"w-{i}", i)]) for i in range(30)))
+        done = True
+        await reader
+        return seen
+
+    assert sorted(run(scenario())) == sorted(f"w-{i}" for i in range(30))
+
+
+def test_change_log_writes_take_the_advisory_lock_on_postgresql(run):
+    statements = []
+
+    async def execute(statement, params=None):
+        statements.append(str(statement))
+
+    session = SimpleNamespace(bind=SimpleNamespace(dialect=SimpleNamespace(name="postgresql")), execute=execute)
+    run(store._log_changes(session, ["a"], "upsert"))
+    assert "pg_advisory_xact_lock" in statements[0]
+    assert statements[1].startswith("INSERT INTO article_changes")
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from app.cluster import ClusterIndex
+
+STORY = (
+    "Der Bundestag hat am Freitag nach langer Debatte den Haushalt für das kommende "
+    "Jahr beschlossen und dabei die Ausgaben für Bildung und Forschung deutlich erhöht"
+)
+FOLLOW_UP = (
+    "Die Bahn streikt ab Montag bundesweit im Fern- und Regionalverkehr, nachdem die "
+    "Tarifverhandlungen mit der Gewerkschaft in der Nacht gescheitert sind"
+)
+UNRELATED = "Der Zoo in Leipzig freut sich über zwei junge Elefanten, die am Wochenende geboren wurden"
+
+
+def article(article_id: str, text: str, minute: int = 0) -> dict:
+    return {
+        "id": article_id,
+        "headline": text,
+        "source": article_id,
+        "published_at": datetime(2024, 3, 1, 12, minute),
+        "related_sources": [{"source": article_id, "url": f"https://{article_id}.example/"}],
+    }
+
+
+def test_batch_returns_only_clusters_that_still_exist():
+    index = ClusterIndex()
+    index.add_batch([article("X", STORY), article("A", STORY, 1)])
+    assert index.cluster_of("A") == index.cluster_of("X")
+
+    # A leaves and starts a story of its own, then X empties the old one by following A
+    touched = index.add_batch([article("A", FOLLOW_UP, 1), article("X", FOLLOW_UP)])
+    assert touched == {index.cluster_of("A")}
+    assert index.cluster_of("X") == index.cluster_of("A")
+    assert [index.canonical(cluster_id) for cluster_id in touched] == ["X"]
+
+
+def test_article_leaving_a_story_does_not_rejoin_it():
+    index = ClusterIndex()
+    index.add_batch([article("X", STORY), article("A", STORY, 1)])
+    story = index.cluster_of("A")
+
+    touched = index.add_batch([article("X", UNRELATED)])
+    assert index.members(story) == ["A"]
+    assert index.members(index.cluster_of("X")) == ["X"]
+    assert touched == {story, index.cluster_of("X")}
+    assert index.related_sources(story) == [{"source": "A", "url": "https://A.example/"}]
@@ -0,0 +1,138 @@
+import asyncio
+import io
+from datetime import datetime
+
+import httpx
+import pytest
+from PIL import Image
+
+from app import images, main, store
+from app.db import SessionLocal
+from app.images import ImageFetchError, ThumbnailCache
+
+# Public address literals, so no name lookup is needed
+IMAGE_HOST = "93.184.216.34"
+
+
+def png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def cache(tmp_path, handler, **kwargs) -> ThumbnailCache:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return ThumbnailCache(str(tmp_path), client=client, **kwargs)
+
+
+def image_handler(requests: list):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, content=png(request.url.path.strip("/")))
+
+    return handler
+
+
+def test_concurrent_requests_share_one_fetch(run, tmp_path):
+    requests = []
+    thumbnails = cache(tmp_path, image_handler(requests))
+    url = f"http://{IMAGE_HOST}/red"
+
+    async def scenario():
+        return await asyncio.gather(*(thumbnails.get(url, "card") for _ in range(10)))
+
+    paths = run(scenario())
+    assert len(requests) == 1
+    assert requests[0].headers["host"] == IMAGE_HOST
+    assert len(set(paths)) == 1 and paths[0].exists()
+
+
+def test_evicted_files_outlive_the_grace_period_only(run, tmp_path, monkeypatch):
+    requests = []
+    # Room for about one image's thumbnails
+    thumbnails = cache(tmp_path, image_handler(requests), max_bytes=3000)
+
+    async def scenario():
+        red = await thumbnails.get(f"http://{IMAGE_HOST}/red", "card")
+        await thumbnails.get(f"http://{IMAGE_HOST}/blue", "card")
+        # Evicted, but the path handed out above can still be served
+        evicted = red not in thumbnails._files and red.exists()
+        monkeypatch.setattr(images, "EVICTION_GRACE", 0)
+        await thumbnails.get(f"http://{IMAGE_HOST}/green", "card")
+        await thumbnails.get(f"http://{IMAGE_HOST}/white", "card")
+        return red, evicted
+
+    red, evicted = run(scenario())
+    assert evicted
+    assert not red.exists()
+    assert thumbnails._total_bytes <= 3000
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/image.png",
+    "http://10.0.0.8/image.png",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/image.png",
+    "http://[::ffff:127.0.0.1]/image.png",
+    f"ftp://{IMAGE_HOST}/image.png",
+    "file:///etc/passwd",
+    "http://[::1",
+])
+def test_unsafe_or_invalid_urls_are_refused(run, tmp_path, url):
+    requests = []
+    thumbnails = cache(tmp_path, image_handler(requests))
+
+    with pytest.raises(ImageFetchError):
+        run(thumbnails.get(url, "card"))
+    assert requests == []
+
+
+def test_redirects_are_checked_and_failures_remembered(run, tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(302, headers={"Location": "http://127.0.0.1/admin"})
+
+    thumbnails = cache(tmp_path, handler)
+    url = f"http://{IMAGE_HOST}/moved"
+    for _ in range(2):
+        with pytest.raises(ImageFetchError):
+            run(thumbnails.get(url, "card"))
+    # The redirect target is never contacted, and the failure is not retried
+    assert [str(request.url) for request in requests] == [url]
+
+
+def test_image_route_revalidates_and_skips_missing_images(run, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "thumbnail_cache", cache(tmp_path, image_handler([])))
+    article = {
+        "headline": "Bildtest",
+        "source": "dpa",
+        "published_at": datetime(2024, 3, 1, 12, 0),
+        "summary": "",
+        "related_sources": [],
+    }
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            async with SessionLocal() as session:
+                await store.upsert_articles(session, [
+                    {**article, "id": "with-image", "image_url": f"http://{IMAGE_HOST}/red"},
+                    {**article, "id": "without-image", "image_url": ""},
+                ])
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.get("/api/images/with-image/card")
+                again = await client.get(
+                    "/api/images/with-image/card", headers={"If-None-Match": first.headers["etag"]}
+                )
+                missing = await client.get("/api/images/without-image/card")
+                return first, again, missing
+
+    first, again, missing = run(scenario())
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/webp"
+    assert again.status_code == 304
+    assert again.content == b""
+    assert missing.status_code == 404
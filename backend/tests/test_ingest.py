@@ -0,0 +1,255 @@
+import asyncio
+import random
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Callable
+
+import httpx
+import pytest
+
+from app import store
+from app.db import SessionLocal
+from app.ingest import FeedSource, Ingestor
+
+
+def rss(feed: str, count: int, dated: bool = True) -> bytes:
+    rng = random.Random(feed)
+    items = []
+    for i in range(count):
+        # Random vocabulary so unrelated items do not cluster into stories
+        summary = " ".join(f"w{rng.randrange(10 ** 6)}" for _ in range(12))
+        date = "<pubDate>Fri, 01 Mar 2024 12:00:00 GMT</pubDate>" if dated else ""
+        items.append(
+            f"<item><title>{feed} Meldung {i}</title><link>https://{feed}/{i}</link>"
+            f"<guid>https://{feed}/{i}</guid>{date}<description>{summary}</description></item>"
+        )
+    return f"<rss><channel>{''.join(items)}</channel></rss>".encode()
+
+
+def ingestor(handler: Callable, **kwargs) -> Ingestor:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return Ingestor(client=client, **kwargs)
+
+
+async def revision() -> int:
+    async with SessionLocal() as session:
+        return await store.current_revision(session)
+
+
+def test_unchanged_feed_is_skipped_with_304(run):
+    seen_validators = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_validators.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content=rss("a.example", 5))
+
+    async def scenario():
+        ingest = ingestor(handler)
+        sources = [FeedSource("A", "https://a.example/feed")]
+        first = await ingest.run_once(sources)
+        second = await ingest.run_once(sources)
+        return first, second
+
+    first, second = run(scenario())
+    assert seen_validators == [None, '"v1"']
+    assert (first["changed"], first["articles"]) == (1, 5)
+    assert (second["changed"], second["articles"]) == (0, 0)
+
+
+def test_validators_are_kept_only_after_the_write(run, monkeypatch):
+    seen_validators = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_validators.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content=rss("a.example", 5))
+
+    upsert = store.upsert_articles
+
+    async def failing_upsert(session, items):
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        ingest = ingestor(handler)
+        sources = [FeedSource("A", "https://a.example/feed")]
+        monkeypatch.setattr(store, "upsert_articles", failing_upsert)
+        with pytest.raises(RuntimeError):
+            await ingest.run_once(sources)
+        monkeypatch.setattr(store, "upsert_articles", upsert)
+        return await ingest.run_once(sources)
+
+    stats = run(scenario())
+    # The failed batch is fetched again in full instead of being answered with a 304
+    assert seen_validators == [None, None]
+    assert stats["articles"] == 5
+    assert run(revision()) == 5
+
+
+def test_per_host_limit(run):
+    active = defaultdict(int)
+    peak = defaultdict(int)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, content=rss(f"{host}{request.url.path}", 2))
+
+    sources = [
+        FeedSource(host, f"https://{host}/feed/{i}")
+        for host in ("a.example", "b.example")
+        for i in range(10)
+    ]
+    stats = run(ingestor(handler, per_host=3).run_once(sources))
+    assert stats["changed"] == 20
+    assert peak == {"a.example": 3, "b.example": 3}
+
+
+def test_articles_are_upserted_in_batches(run, monkeypatch):
+    batches = []
+    upsert = store.upsert_articles
+
+    async def recording_upsert(session, items):
+        batches.append(len(items))
+        return await upsert(session, items)
+
+    monkeypatch.setattr(store, "upsert_articles", recording_upsert)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=rss(request.url.path, 20))
+
+    sources = [FeedSource("A", f"https://a.example/feed/{i}") for i in range(10)]
+    run(ingestor(handler, batch_size=50).run_once(sources))
+
+    # A batch is written once it reaches batch_size, at a feed boundary
+    assert sum(batches) == 200
+    assert 1 < len(batches) < len(sources)
+    assert all(size <= 50 + 20 for size in batches)
+    assert run(revision()) == 200
+
+
+@pytest.mark.parametrize("dated", [True, False])
+def test_unchanged_items_add_no_change_log_entries(run, dated):
+    def handler(request: httpx.Request) -> httpx.Response:
+        # No validators, so every run downloads and parses the whole feed
+        return httpx.Response(200, content=rss(request.url.path, 10, dated=dated))
+
+    async def snapshot():
+        async with SessionLocal() as session:
+            articles, _ = await store.list_articles(session, 100)
+            return await store.current_revision(session), {a.id: a.published_at for a in articles}
+
+    async def scenario():
+        ingest = ingestor(handler)
+        sources = [FeedSource("A", "https://a.example/feed")]
+        await ingest.run_once(sources)
+        before = await snapshot()
+        await asyncio.sleep(0.01)
+        await ingest.run_once(sources)
+        return before, await snapshot()
+
+    before, after = run(scenario())
+    assert before[0] == 10
+    # Undated items keep the time they were first seen
+    assert after == before
+
+
+STORY = (
+    "Der Bundestag hat am Freitag nach langer Debatte den Haushalt für das kommende "
+    "Jahr beschlossen und dabei die Ausgaben für Bildung und Forschung deutlich erhöht"
+)
+
+
+def story_feed(outlet: str) -> bytes:
+    # Recent, so the story stays inside the clustering window between runs
+    published = format_datetime(datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0))
+    return (
+        f"<rss><channel><item><title>Bundestag beschließt Haushalt</title>"
+        f"<link>https://{outlet}/haushalt</link><guid>https://{outlet}/haushalt</guid>"
+        f"<pubDate>{published}</pubDate>"
+        f"<description>{STORY} ({outlet})</description></item></channel></rss>"
+    ).encode()
+
+
+def story_handler(request: httpx.Request) -> httpx.Response:
+    # a.example sends no validators and is downloaded in full every run
+    if request.url.host != "a.example" and request.headers.get("if-none-match") == '"v1"':
+        return httpx.Response(304)
+    return httpx.Response(200, headers={"ETag": '"v1"'}, content=story_feed(request.url.host))
+
+
+def test_refetched_story_member_rewrites_nothing(run):
+    async def scenario():
+        ingest = ingestor(story_handler)
+        sources = [FeedSource("A", "https://a.example/feed"), FeedSource("B", "https://b.example/feed")]
+        await ingest.run_once(sources)
+        before = await revision()
+        for _ in range(3):
+            await ingest.run_once(sources)
+        async with SessionLocal() as session:
+            articles, _ = await store.list_articles(session, 10)
+        return before, await revision(), articles
+
+    before, after, articles = run(scenario())
+    assert after == before
+    assert len(articles) == 2
+    assert articles[0].canonical_id == articles[1].canonical_id
+    assert len(articles[0].related_sources) == 2
+
+
+def test_story_update_skips_deleted_members(run):
+    async def scenario():
+        ingest = ingestor(story_handler)
+        await ingest.run_once([FeedSource("A", "https://a.example/feed"), FeedSource("B", "https://b.example/feed")])
+        async with SessionLocal() as session:
+            articles, _ = await store.list_articles(session, 10)
+            deleted = next(a.id for a in articles if a.source == "B")
+            await store.delete_articles(session, [deleted])
+        # A third outlet grows the story, which still lists the deleted article
+        await ingest.run_once([FeedSource("C", "https://c.example/feed")])
+        async with SessionLocal() as session:
+            articles, _ = await store.list_articles(session, 10)
+        return deleted, articles
+
+    deleted, articles = run(scenario())
+    assert deleted not in {a.id for a in articles}
+    assert sorted(a.source for a in articles) == ["A", "C"]
+    assert all(len(a.related_sources) == 3 for a in articles)
+
+
+def test_batch_that_moves_a_whole_story_is_written(run):
+    texts = [STORY]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        published = format_datetime(datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0))
+        items = "".join(
+            f"<item><title>Meldung {name}</title><link>https://a.example/{name}</link>"
+            f"<guid>https://a.example/{name}</guid><pubDate>{published}</pubDate>"
+            f"<description>{texts[-1]}</description></item>"
+            # The second run lists the members in reverse order
+            for name in (("x", "a") if len(texts) == 1 else ("a", "x"))
+        )
+        return httpx.Response(200, content=f"<rss><channel>{items}</channel></rss>".encode())
+
+    async def scenario():
+        ingest = ingestor(handler)
+        sources = [FeedSource("A", "https://a.example/feed")]
+        await ingest.run_once(sources)
+        # Both members are rewritten together, so their old story dissolves
+        texts.append("Die Bahn streikt ab Montag bundesweit im Fern- und Regionalverkehr, "
+                     "nachdem die Tarifverhandlungen in der Nacht gescheitert sind")
+        stats = await ingest.run_once(sources)
+        async with SessionLocal() as session:
+            articles, _ = await store.list_articles(session, 10)
+        return stats, articles
+
+    stats, articles = run(scenario())
+    assert stats["articles"] == 2
+    assert len({a.canonical_id for a in articles}) == 1
+    assert all("Bahn" in a.summary for a in articles)
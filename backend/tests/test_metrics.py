@@ -0,0 +1,39 @@
+from app import metrics
+
+GET = (("method", "GET"),)
+
+
+def streaming_app(content_type: bytes, observed: list):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        observed.append((metrics.IN_FLIGHT._values.get(GET, 0), metrics.EVENT_STREAMS._values.get((), 0)))
+        await send({"type": "http.response.body", "body": b"data: {}\n\n", "more_body": False})
+
+    return app
+
+
+def call(run, app, path: str) -> None:
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": path}
+    run(metrics.MetricsMiddleware(app)(scope, receive, send))
+
+
+def test_event_streams_are_not_counted_as_requests_in_flight(run):
+    observed = []
+    labels = GET + (("route", "unmatched"),)
+    before = metrics.REQUEST_LATENCY._series.get(labels, ([0], [0.0]))[0][:]
+
+    in_flight = metrics.IN_FLIGHT._values.get(GET, 0)
+    call(run, streaming_app(b"text/event-stream; charset=utf-8", observed), "/stream")
+    assert observed == [(in_flight, 1)]
+    assert metrics.REQUEST_LATENCY._series.get(labels, ([0], [0.0]))[0] == before
+
+    call(run, streaming_app(b"application/json", observed), "/json")
+    assert observed[1] == (in_flight + 1, 0)
+    assert sum(metrics.REQUEST_LATENCY._series[labels][0]) == sum(before) + 1
+    assert (metrics.IN_FLIGHT._values[GET], metrics.EVENT_STREAMS._values[()]) == (in_flight, 0)
@@ -0,0 +1,79 @@
+import asyncio
+import math
+import random
+
+import pytest
+
+from app.search import SearchIndex, stem, tokenize
+
+
+def reference_search(docs: dict, query: str, k1: float = 1.2, b: float = 0.75) -> list:
+    tokens = {article_id: tokenize(headline) * 2 + tokenize(summary) for article_id, (headline, summary) in docs.items()}
+    avgdl = sum(map(len, tokens.values())) / len(tokens)
+    scores = {}
+    for term in set(tokenize(query)):
+        containing = [article_id for article_id, terms in tokens.items() if term in terms]
+        idf = math.log(1 + (len(tokens) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for article_id in containing:
+            tf = tokens[article_id].count(term)
+            norm = k1 * (1 - b + b * len(tokens[article_id]) / avgdl)
+            scores[article_id] = scores.get(article_id, 0) + idf * tf * (k1 + 1) / (tf + norm)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def corpus(count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    # Skewed vocabulary: the first words land in most documents and take
+    # the dense path, the long tail the sparse one
+    words = [f"begriff{i}x" for i in range(300)]
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return {
+        f"a{i}": (" ".join(rng.choices(words, weights, k=6)), " ".join(rng.choices(words, weights, k=30)))
+        for i in range(count)
+    }
+
+
+def test_stem_folds_inflections_and_umlauts():
+    assert stem("häuser") == stem("haus") == "haus"
+    assert stem("straße") == "strass"
+    assert tokenize("Die Bahn und der Streik") == ["bahn", "streik"]
+
+
+@pytest.mark.parametrize("query", ["begriff0x", "begriff0x begriff1x begriff2x", "begriff250x begriff3x", "unbekannt"])
+def test_search_matches_reference_bm25(query):
+    docs = corpus(2000)
+    index = SearchIndex()
+    for article_id, (headline, summary) in docs.items():
+        index.add(article_id, headline, summary)
+
+    expected = reference_search(docs, query)[:10]
+    hits = index.search(query, limit=10)
+    assert [score for _, score in hits] == pytest.approx([score for _, score in expected], rel=1e-4)
+    assert {article_id for article_id, _ in hits} <= {article_id for article_id, _ in reference_search(docs, query)}
+
+
+def test_updates_and_removals_are_never_returned():
+    docs = corpus(3000, seed=1)
+    index = SearchIndex()
+    for article_id, (headline, summary) in docs.items():
+        index.add(article_id, headline, summary)
+    assert index.search("begriff0x", limit=5)
+
+    removed = {f"a{i}" for i in range(0, 3000, 2)}
+    for article_id in removed:
+        index.remove(article_id)
+    index.add("a1", "völlig neue schlagzeile", "")
+    del docs["a1"]
+
+    hits = index.search("begriff0x begriff1x", limit=3000)
+    assert not {article_id for article_id, _ in hits} & (removed | {"a1"})
+    assert [article_id for article_id, _ in index.search("schlagzeile")] == ["a1"]
+
+    assert index.needs_compaction()
+    asyncio.run(index.compact())
+    assert not index.needs_compaction()
+    live = {article_id: docs[article_id] for article_id in docs if article_id not in removed}
+    live["a1"] = ("völlig neue schlagzeile", "")
+    expected = reference_search(live, "begriff0x begriff1x")[:20]
+    hits = index.search("begriff0x begriff1x", limit=20)
+    assert [score for _, score in hits] == pytest.approx([score for _, score in expected], rel=1e-4)
@@ -0,0 +1,76 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import store
+from app.db import SessionLocal
+
+
+def make_articles(count: int) -> list:
+    start = datetime(2024, 3, 1, 12, 0)
+    return [
+        {
+            "id": f"news-{i:03d}",
+            "headline": f"Schlagzeile {i}",
+            "image_url": "",
+            "source": "dpa",
+            # Pairs share a timestamp so the id has to break the tie
+            "published_at": start + timedelta(minutes=i // 2),
+            "summary": "",
+            "related_sources": [],
+        }
+        for i in range(count)
+    ]
+
+
+def test_list_articles_pages_by_keyset(run):
+    async def scenario():
+        async with SessionLocal() as session:
+            await store.upsert_articles(session, make_articles(25))
+
+            pages, after = [], None
+            while True:
+                page, after = await store.list_articles(session, 10, after)
+                pages.append([article.id for article in page])
+                if after is None:
+                    break
+            return pages
+
+    pages = run(scenario())
+    expected = sorted(
+        make_articles(25), key=lambda a: (a["published_at"], a["id"]), reverse=True
+    )
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [article_id for page in pages for article_id in page] == [a["id"] for a in expected]
+
+
+def test_list_articles_cursor_survives_inserts(run):
+    async def scenario():
+        async with SessionLocal() as session:
+            articles = make_articles(20)
+            await store.upsert_articles(session, articles[:10])
+            first, after = await store.list_articles(session, 5)
+            # Newer articles land on top of the feed, not in the next page
+            await store.upsert_articles(session, articles[10:])
+            second, _ = await store.list_articles(session, 5, after)
+            return [a.id for a in first], [a.id for a in second]
+
+    first, second = run(scenario())
+    assert first == ["news-009", "news-008", "news-007", "news-006", "news-005"]
+    assert second == ["news-004", "news-003", "news-002", "news-001", "news-000"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"yesterday|news-001").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|news-001").decode(),
+])
+def test_list_articles_rejects_invalid_cursor(run, cursor):
+    async def scenario():
+        async with SessionLocal() as session:
+            await store.list_articles(session, 10, cursor)
+
+    with pytest.raises(store.InvalidCursor):
+        run(scenario())
@@ -109,9 +109,10 @@ export default function NewsDetailPage() {
         <article className="bg-white rounded-lg shadow-lg overflow-hidden">
           <div className="relative h-96 w-full">
             <Image
-              src={newsDetail.imageUrl}
+              src={`http://localhost:8000/api/images/${newsDetail.id}/detail`}
               alt={newsDetail.headline}
               fill
+              unoptimized
               style={{ objectFit: 'cover' }}
               priority
             />
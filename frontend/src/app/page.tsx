@@ -10,7 +10,6 @@ interface NewsItem {
   imageUrl: string;
   source: string;
   timestamp: string;
-  summary: string;
 }
 
 export default function Home() {
@@ -22,7 +21,9 @@ export default function Home() {
     const fetchNews = async () => {
       try {
         console.log('Fetching news...');
-        const response = await axios.get('http://localhost:8000/api/news');
+        const response = await axios.get('http://localhost:8000/api/news', {
+          params: { fields: 'card' },
+        });
         console.log('News data received:', response.data);
         setNewsItems(response.data);
       } catch (error) {
@@ -68,7 +69,7 @@ export default function Home() {
       <div className="max-w-7xl mx-auto">
         <h1 className="text-3xl font-bold text-gray-900 mb-8">Aktuelle Nachrichten</h1>
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-          {newsItems.map((item) => (
+          {newsItems.map((item, index) => (
             <NewsCard
               key={item.id}
               id={item.id}
@@ -76,6 +77,7 @@ export default function Home() {
               imageUrl={item.imageUrl}
               source={item.source}
               timestamp={item.timestamp}
+              priority={index < 3}
             />
           ))}
         </div>
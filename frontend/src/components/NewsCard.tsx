@@ -10,9 +10,10 @@ interface NewsCardProps {
   imageUrl: string;
   source: string;
   timestamp: string;
+  priority?: boolean;
 }
 
-export default function NewsCard({ id, headline, imageUrl, source, timestamp }: NewsCardProps) {
+export default function NewsCard({ id, headline, imageUrl, source, timestamp, priority = false }: NewsCardProps) {
   const [imageError, setImageError] = useState(false);
 
   const handleImageError = () => {
@@ -26,13 +27,14 @@ export default function NewsCard({ id, headline, imageUrl, source, timestamp }:
         <div className="relative h-48 w-full bg-gray-200">
           {!imageError ? (
             <Image
-              src={imageUrl}
+              src={`http://localhost:8000/api/images/${id}/card`}
               alt={headline}
               fill
+              unoptimized
               style={{ objectFit: 'cover' }}
               className="transition-transform duration-300 hover:scale-105"
               onError={handleImageError}
-              priority
+              priority={priority}
             />
           ) : (
             <div className="absolute inset-0 flex items-center justify-center bg-gray-200">